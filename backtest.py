@@ -0,0 +1,342 @@
+import itertools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_proc import load_dataset
+
+# outcomes of every market and the column suffixes of their odds. The odds
+# of a bookmaker are its prefix plus the suffix, e.g. "B365" + ">2.5", the
+# closing odds have their own prefix, e.g. "B365C" or "PSC"
+MARKETS = {
+    "1x2": {"outcomes": ["H", "D", "A"], "suffixes": ["H", "D", "A"]},
+    "ou25": {"outcomes": ["over", "under"], "suffixes": [">2.5", "<2.5"]},
+    "ah": {"outcomes": ["home", "away"], "suffixes": ["AHH", "AHA"]},
+}
+# closing odds of Pinnacle, the sharpest prices in the data, are used to
+# estimate the true probabilities
+REFERENCE = {"1x2": "PSC", "ou25": "PC", "ah": "PC"}
+# handicap of the home team, for the bet and for the closing odds
+_AH_LINES = ["AHh", "BbAHh"]
+_AH_CLOSING_LINE = "AHCh"
+
+Market = namedtuple(
+    "Market", ["name", "matches", "outcomes", "odds", "fair", "returns"]
+)
+Market.__doc__ = """odds of one market of every played match, sorted by date
+
+odds, fair (the probabilities of the reference closing odds, without their
+margin) and returns (profit of a unit stake at the odds) are arrays of
+(match, outcome), NaN where there are no odds.
+"""
+
+
+def build_market(
+    data: "pd.DataFrame",
+    market: str = "1x2",
+    bookmaker: str = "B365",
+    reference: str = None,
+) -> Market:
+    """get the odds of a bookmaker for one market of every played match"""
+    spec = MARKETS[market]
+    reference = REFERENCE[market] if reference is None else reference
+    played = data["FTHG"].notna() & data["FTAG"].notna()
+    data = data[played].sort_values("Date", kind="stable")
+
+    def odds_of(prefix):
+        cols = [prefix + suffix for suffix in spec["suffixes"]]
+        return data.reindex(columns=cols).to_numpy(dtype=float)
+
+    odds = odds_of(bookmaker)
+    closing = odds_of(reference)
+    home_goals = data["FTHG"].to_numpy(dtype=float)
+    away_goals = data["FTAG"].to_numpy(dtype=float)
+
+    if market == "1x2":
+        ftr = data["FTR"].astype(str).to_numpy()
+        won = (ftr[:, None] == np.array(spec["outcomes"])).astype(float)
+        returns = np.where(won == 1, odds - 1, -1.0)
+    elif market == "ou25":
+        over = home_goals + away_goals > 2.5
+        won = np.column_stack([over, ~over]).astype(float)
+        returns = np.where(won == 1, odds - 1, -1.0)
+    else:
+        line = _ah_line(data, bookmaker)
+        margin = home_goals - away_goals
+        returns = np.column_stack(
+            [
+                _ah_returns(margin + line, odds[:, 0]),
+                _ah_returns(-(margin + line), odds[:, 1]),
+            ]
+        )
+        # the closing odds only say something about the same line
+        closing_line = data.reindex(columns=[_AH_CLOSING_LINE]).iloc[:, 0]
+        same_line = closing_line.to_numpy(dtype=float) == line
+        closing = np.where(same_line[:, None], closing, np.nan)
+
+    implied = 1 / closing
+    fair = implied / implied.sum(axis=1, keepdims=True)
+    returns = np.where(np.isnan(odds), np.nan, returns)
+    matches = data[["season", "Date", "HomeTeam", "AwayTeam"]].reset_index(drop=True)
+    return Market(market, matches, spec["outcomes"], odds, fair, returns)
+
+
+def _ah_line(data: "pd.DataFrame", bookmaker: str) -> "np.ndarray":
+    """get the home handicap of the bookmaker's odds, its own line column
+    in the early seasons and the market line later"""
+    cols = [f"{bookmaker}AH"] + _AH_LINES
+    lines = data.reindex(columns=cols).astype(float)
+    return lines.bfill(axis=1).iloc[:, 0].to_numpy()
+
+
+def _ah_returns(margin: "np.ndarray", odds: "np.ndarray") -> "np.ndarray":
+    """get the profit of a unit asian handicap bet
+
+    `margin` is the goal difference of the side with its handicap. Quarter
+    lines split the stake over the two neighbouring half lines.
+    """
+    returns = np.zeros(len(margin))
+    for offset in (-0.25, 0.25):
+        # whole and half lines have the same result for both halves
+        half = np.where(margin * 4 % 2 == 1, margin + offset, margin)
+        returns += np.select([half > 0, half < 0], [odds - 1, -1.0], 0.0) / 2
+    return np.where(np.isnan(margin), np.nan, returns)
+
+
+def flat_stakes(
+    market: Market,
+    outcome: str = "favourite",
+    min_odds: float = 1.0,
+    max_odds: float = np.inf,
+    stake: float = 1.0,
+) -> "np.ndarray":
+    """bet a fixed stake on one outcome, or the favourite or underdog, of
+    every match with odds in [min_odds, max_odds]"""
+    odds = market.odds
+    rows = np.arange(len(odds))
+    picked = np.zeros(odds.shape, dtype=bool)
+    has_odds = ~np.isnan(odds).all(axis=1)
+    if outcome == "favourite":
+        best = np.nan_to_num(odds, nan=np.inf).argmin(axis=1)
+        picked[rows[has_odds], best[has_odds]] = True
+    elif outcome == "underdog":
+        best = np.nan_to_num(odds, nan=0).argmax(axis=1)
+        picked[rows[has_odds], best[has_odds]] = True
+    else:
+        picked[:, market.outcomes.index(outcome)] = True
+    picked &= (odds >= min_odds) & (odds <= max_odds)
+    return np.where(picked, stake, 0.0)
+
+
+def value_stakes(
+    market: Market, threshold: float = 0.0, stake: float = 1.0
+) -> "np.ndarray":
+    """bet a fixed stake on every outcome whose odds beat the fair closing
+    odds by more than `threshold`"""
+    edge = market.odds * market.fair - 1
+    return np.where(edge > threshold, stake, 0.0)
+
+
+def kelly_stakes(
+    market: Market,
+    fraction: float = 0.25,
+    threshold: float = 0.0,
+    max_stake: float = 0.1,
+) -> "np.ndarray":
+    """bet a `fraction` of the kelly stake, as a share of the bankroll, on
+    the outcomes with an edge over the fair closing odds"""
+    edge = market.odds * market.fair - 1
+    kelly = np.where(edge > threshold, edge / (market.odds - 1), 0.0)
+    stakes = np.clip(kelly * fraction, 0, max_stake)
+    # never stake more than the bankroll on one match
+    total = stakes.sum(axis=1, keepdims=True)
+    return np.where(total > 1, stakes / np.where(total > 1, total, 1), stakes)
+
+
+# strategy -> stakes function, and whether its stakes are shares of the
+# current bankroll instead of amounts
+STRATEGIES = {
+    "flat": (flat_stakes, False),
+    "value": (value_stakes, False),
+    "kelly": (kelly_stakes, True),
+}
+
+
+class BacktestResult(
+    namedtuple(
+        "BacktestResult",
+        [
+            "bets",
+            "staked",
+            "profit",
+            "roi",
+            "max_drawdown",
+            "max_drawdown_pct",
+            "ruined",
+            "curve",
+        ],
+    )
+):
+    """summary of a backtest and its curve, one row per match with the
+    staked amount, the profit, the cumulative pnl, bankroll and drawdown.
+    `ruined` is set when betting stopped at a match whose stakes the
+    bankroll could not cover."""
+
+    def __str__(self):
+        return (
+            f"bets: {self.bets}, staked: {self.staked:.2f}, "
+            f"profit: {self.profit:.2f}, roi: {self.roi:.2%}, "
+            f"max drawdown: {self.max_drawdown:.2f} ({self.max_drawdown_pct:.2%})"
+            + (", ruined" if self.ruined else "")
+        )
+
+    def by_season(self) -> "pd.DataFrame":
+        """get the bets, stakes, profit and roi of every season"""
+        seasons = self.curve.groupby("season", sort=False, observed=True).agg(
+            bets=("bets", "sum"), staked=("staked", "sum"), profit=("profit", "sum")
+        )
+        seasons["roi"] = seasons["profit"] / seasons["staked"]
+        return seasons
+
+
+def _simulate(market: Market, strategy: str, bankroll: float, params: dict) -> tuple:
+    """get the stakes and profit of every match, the bankroll after it and
+    whether the bankroll ran out
+
+    fixed stakes stop at the first match whose stakes are more than the
+    bankroll before it, so that the bankroll never goes below zero.
+    """
+    stakes_of, compounding = STRATEGIES[strategy]
+    stakes = stakes_of(market, **params)
+    stakes = np.where(np.isnan(market.returns), 0.0, stakes)
+    returns = np.nan_to_num(market.returns)
+    if compounding:
+        # the stakes are shares of the bankroll before the match
+        growth = 1 + (stakes * returns).sum(axis=1)
+        after = bankroll * np.cumprod(growth)
+        before = np.concatenate([[bankroll], after[:-1]])
+        stakes = stakes * before[:, None]
+    profit = (stakes * returns).sum(axis=1)
+    before = bankroll + np.concatenate([[0.0], np.cumsum(profit)[:-1]])
+    # the bankroll before the first uncovered match is right, the stakes up
+    # to it are unchanged
+    uncovered = stakes.sum(axis=1) > before + 1e-9
+    ruined = bool(uncovered.any())
+    if ruined:
+        stakes[uncovered.argmax() :] = 0.0
+        profit = (stakes * returns).sum(axis=1)
+    return stakes, profit, bankroll + np.cumsum(profit), ruined
+
+
+def _summarize(
+    stakes: "np.ndarray",
+    profit: "np.ndarray",
+    bankrolls: "np.ndarray",
+    ruined: bool,
+    bankroll: float,
+) -> dict:
+    peaks = np.maximum.accumulate(np.concatenate([[bankroll], bankrolls]))[1:]
+    drawdown = peaks - bankrolls
+    staked = stakes.sum()
+    return {
+        "bets": int((stakes > 0).sum()),
+        "staked": float(staked),
+        "profit": float(profit.sum()),
+        "roi": float(profit.sum() / staked) if staked else np.nan,
+        "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        "max_drawdown_pct": float((drawdown / peaks).max()) if len(drawdown) else 0.0,
+        "ruined": ruined,
+    }
+
+
+def run_backtest(
+    market: Market, strategy: str = "flat", bankroll: float = 100.0, **params
+) -> BacktestResult:
+    """backtest a staking strategy over all matches of a market at once"""
+    stakes, profit, bankrolls, ruined = _simulate(market, strategy, bankroll, params)
+    summary = _summarize(stakes, profit, bankrolls, ruined, bankroll)
+    curve = market.matches.assign(
+        bets=(stakes > 0).sum(axis=1),
+        staked=stakes.sum(axis=1),
+        profit=profit,
+        pnl=bankrolls - bankroll,
+        bankroll=bankrolls,
+        drawdown=np.maximum.accumulate(np.concatenate([[bankroll], bankrolls]))[1:]
+        - bankrolls,
+    )
+    return BacktestResult(curve=curve, **summary)
+
+
+# market of the grid search workers, sent once to every process
+_WORKER_MARKET = None
+
+
+def _init_worker(market: Market) -> None:
+    global _WORKER_MARKET
+    _WORKER_MARKET = market
+
+
+def _run_batch(strategy: str, bankroll: float, batch: list, market=None) -> list:
+    """summarize the backtest of every parameter combination of a batch"""
+    market = _WORKER_MARKET if market is None else market
+    rows = []
+    for params in batch:
+        summary = _summarize(
+            *_simulate(market, strategy, bankroll, params), bankroll=bankroll
+        )
+        rows.append({**params, **summary})
+    return rows
+
+
+def grid_search(
+    market: Market,
+    strategy: str,
+    grid: dict,
+    bankroll: float = 100.0,
+    processes: int = None,
+    batch_size: int = 64,
+) -> "pd.DataFrame":
+    """backtest every combination of the parameter values in `grid`
+
+    the combinations are run in batches in a pool of `processes` (all cores
+    by default, 1 runs them in this process), the market is sent to each
+    process once. Returns one row per combination, best roi first.
+    """
+    combos = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    batches = [
+        combos[start : start + batch_size]
+        for start in range(0, len(combos), batch_size)
+    ]
+    if processes == 1 or len(batches) <= 1:
+        results = [_run_batch(strategy, bankroll, batch, market) for batch in batches]
+    else:
+        with ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=(market,)
+        ) as pool:
+            results = list(
+                pool.map(
+                    _run_batch,
+                    itertools.repeat(strategy),
+                    itertools.repeat(bankroll),
+                    batches,
+                )
+            )
+    rows = [row for result in results for row in result]
+    return pd.DataFrame(rows).sort_values("roi", ascending=False, ignore_index=True)
+
+
+def main():
+    data = load_dataset()
+    market = build_market(data, "1x2", "B365")
+    for strategy in STRATEGIES:
+        print(f"{strategy}: {run_backtest(market, strategy)}")
+    grid = {
+        "fraction": [0.1, 0.25, 0.5, 1.0],
+        "threshold": np.linspace(0, 0.2, 21),
+        "max_stake": [0.02, 0.05, 0.1],
+    }
+    print(grid_search(market, "kelly", grid).head(10))
+
+
+if __name__ == "__main__":
+    main()
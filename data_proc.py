@@ -1,79 +1,1345 @@
 import pandas as pd
 import os
 import glob
+import functools
+import hashlib
+import inspect
+import json
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable
 import numpy as np
+import pyarrow.parquet as pq
 from pandas.io.parsers import read_csv
+from ratings import RATINGS_PATH, update_ratings
+from result_cache import RESULT_CACHE, dataset_fingerprint, file_fingerprint
+from score_model import GOAL_LINES, PoissonModel, fit_poisson
 
+DATA_PATH = "bet_data.csv"
+STORE_PATH = "bet_data.parquet"
+SOURCE_DIR = os.path.join("data", "bet")
+# source files (name, season, size, mtime and hash) the dataset was built from
+MANIFEST_NAME = "_manifest.json"
+# summaries of the completed seasons, precomputed when the data is ingested
+SUMMARY_PATH = "bet_summaries.parquet"
+# fingerprint of the season partition the summaries were computed from
+SUMMARY_META_NAME = "_source.json"
+# sessions that find the dataset missing or stale convert it one at a time
+_CONVERT_LOCK = threading.Lock()
 
-def read_csv_data() -> "pd.DataFrame":
-    files = glob.glob(os.path.join(os.getcwd(), "data\\bet\\*.csv"))
-    dfs = []
+# columns the pages read, so that they can load just what they display
+COLUMN_GROUPS = {
+    "match": ["season", "Date", "HomeTeam", "AwayTeam"],
+    "goals": ["FTHG", "FTAG", "FTR", "HTHG", "HTAG", "HTR"],
+    "stats": ["HS", "AS", "HST", "AST", "HC", "AC", "HF", "AF", "HY", "AY", "HR", "AR"],
+}
+
+# explicit dtypes of the stored dataset, every other column is odds or
+# other numeric data and is stored as float32
+_CATEGORY_COLS = ["Div", "HomeTeam", "AwayTeam", "Referee", "FTR", "HTR", "season"]
+_STRING_COLS = ["Time"]
+# goals, cards, corners, shots and fouls, downcast to the smallest int type
+_INT_COLS = COLUMN_GROUPS["stats"] + ["FTHG", "FTAG", "HTHG", "HTAG"]
+
+
+def columns_for(*groups: str) -> list:
+    """get the columns of one or more column groups"""
+    return [col for group in groups for col in COLUMN_GROUPS[group]]
+
+
+IngestProgress = namedtuple(
+    "IngestProgress", ["file", "season", "rows", "seconds", "done", "total"]
+)
+
+
+def read_csv_data(
+    incremental: bool = False,
+    source_dir: str = SOURCE_DIR,
+    path: str = STORE_PATH,
+    processes: int = None,
+    progress: Callable[[IngestProgress], None] = None,
+    summary_path: str = SUMMARY_PATH,
+    ratings_path: str = RATINGS_PATH,
+    csv_path: str = DATA_PATH,
+) -> "pd.DataFrame":
+    """merge the season csv files into the dataset
+
+    the files are parsed in a pool of `processes` (all cores by default, 1
+    parses them in this process) and `progress` is called with an
+    IngestProgress after each file, then with the SchemaReport of the
+    normalized data. In incremental mode only new or changed
+    season files are parsed and only their partitions are replaced, the
+    merged csv at `csv_path` is not rewritten. The summaries of the written
+    seasons are materialized to `summary_path` and their new matches are
+    rated on top of the ratings saved at `ratings_path`. The defaults are the
+    paths the app reads.
+    """
+    files = sorted(
+        glob.glob(os.path.join(source_dir, "*.csv")),
+        key=lambda file: season_sort_key(_file_season(file)),
+    )
+    manifest = _load_manifest(path) if incremental else {}
+    new_manifest = {}
+    changed = []
     for file in files:
-        file_name = file.split("\\")[-1]
-        season = file_name[3:5] + "-" + file_name[5:7]
-        print(f"processing season: {season} ...")
-        current_df = pd.read_csv(file, encoding="utf-8")
-        current_df["season"] = season
+        file_name = os.path.basename(file)
+        previous = manifest.get(file_name)
+        entry = _manifest_entry(file, previous)
+        new_manifest[file_name] = entry
+        if (
+            previous is None
+            or previous["sha1"] != entry["sha1"]
+            or not os.path.exists(partition_path(entry["season"], path))
+        ):
+            changed.append(file)
+
+    dfs = _parse_season_files(changed, processes, progress)
+
+    if not incremental:
+        df = _merge_season_dfs(dfs)
+        # df = df.astype({"Time": str})
+        df.to_csv(csv_path, index=False)
+        df, report = normalize_schema(df)
+        if progress is not None:
+            progress(report)
+        for old_path in (path, summary_path):
+            if os.path.isdir(old_path):
+                shutil.rmtree(old_path)
+        write_dataset(df, path)
+        materialize_summaries(df, path=summary_path, store_path=path)
+        update_ratings(df, ratings_path)
+        _save_manifest(path, new_manifest)
+        return df
+
+    if dfs:
+        df, report = normalize_schema(_merge_season_dfs(dfs))
+        if progress is not None:
+            progress(report)
+        write_dataset(df, path)
+        materialize_summaries(df, path=summary_path, store_path=path)
+        update_ratings(df, ratings_path)
+    # drop the seasons whose source files were removed
+    for file_name in manifest.keys() - new_manifest.keys():
+        season = manifest[file_name]["season"]
+        shutil.rmtree(os.path.dirname(partition_path(season, path)))
+        remove_summaries(season, summary_path)
+    _save_manifest(path, new_manifest)
+    return load_dataset(
+        path=path,
+        csv_path=csv_path,
+        summary_path=summary_path,
+        ratings_path=ratings_path,
+    )
+
+
+def _parse_season_file(file: str) -> tuple:
+    """parse one season csv file, returns the frame and the parse time"""
+    start = time.perf_counter()
+    df = pd.read_csv(file, encoding="utf-8")
+    df["season"] = _file_season(file)
+    return df, time.perf_counter() - start
+
+
+def _parse_season_files(
+    files: list, processes: int = None, progress: Callable = None
+) -> list:
+    """parse the season files in a process pool, keeping the order of files"""
+    dfs = [None] * len(files)
+
+    def report(i, df, seconds):
+        dfs[i] = df
+        if progress is not None:
+            done = sum(df is not None for df in dfs)
+            season = _file_season(files[i])
+            progress(
+                IngestProgress(
+                    files[i], season, len(df.index), seconds, done, len(files)
+                )
+            )
+
+    if processes == 1 or len(files) <= 1:
+        for i, file in enumerate(files):
+            report(i, *_parse_season_file(file))
+        return dfs
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {
+            executor.submit(_parse_season_file, file): i for i, file in enumerate(files)
+        }
+        for future in as_completed(futures):
+            report(futures[future], *future.result())
+    return dfs
+
+
+def _merge_season_dfs(dfs: list) -> "pd.DataFrame":
+    """concat the season frames over the union of their columns
+
+    the seasons carry different odds columns, the union keeps them in the
+    order they first appear in, so the result does not depend on which
+    file finished parsing first.
+    """
+    columns = list(dict.fromkeys(col for df in dfs for col in df.columns))
+    return pd.concat(dfs, ignore_index=True).reindex(columns=columns)
+
+
+def _file_season(file: str) -> str:
+    """get the season from a source file name like E0_2021.csv"""
+    file_name = os.path.basename(file)
+    return file_name[3:5] + "-" + file_name[5:7]
+
+
+def _manifest_entry(file: str, previous: dict = None) -> dict:
+    """get the manifest entry of a source file, hashing it only if it changed"""
+    stat = os.stat(file)
+    if (
+        previous is not None
+        and previous["size"] == stat.st_size
+        and previous["mtime"] == stat.st_mtime
+    ):
+        return previous
+
+    digest = hashlib.sha1()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return {
+        "season": _file_season(file),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha1": digest.hexdigest(),
+    }
+
+
+def _temp_path(path: str) -> str:
+    """get a temporary name next to path, unique to this process and thread"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _load_manifest(path: str) -> dict:
+    """load the source files manifest of the dataset"""
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def _save_manifest(path: str, manifest: dict) -> None:
+    """save the source files manifest next to the partitions"""
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    tmp = _temp_path(manifest_path)
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_path)
+
+
+class SchemaReport(
+    namedtuple("SchemaReport", ["bytes_before", "bytes_after", "dropped_columns"])
+):
+    """memory footprint of a frame before and after normalize_schema"""
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self):
+        return (
+            f"memory: {self.bytes_before / 1024**2:.1f} MB -> "
+            f"{self.bytes_after / 1024**2:.1f} MB, "
+            f"saved {self.bytes_saved / 1024**2:.1f} MB, "
+            f"dropped {len(self.dropped_columns)} empty columns"
+        )
 
-        dfs.append(current_df)
+
+def normalize_schema(df: "pd.DataFrame") -> tuple:
+    """drop the empty columns and cast the data to compact dtypes
+
+    returns the normalized frame and a SchemaReport of the memory saved.
+    """
+    bytes_before = int(df.memory_usage(deep=True).sum())
+    dropped = [
+        col
+        for col in df.columns
+        if str(col).startswith("Unnamed:") or df[col].isna().all()
+    ]
+    df = apply_schema(df.drop(columns=dropped))
+    report = SchemaReport(bytes_before, int(df.memory_usage(deep=True).sum()), dropped)
+    return df, report
+
+
+def apply_schema(df: "pd.DataFrame") -> "pd.DataFrame":
+    """cast the raw betting data to the explicit dtypes of the dataset"""
+    # the source files end with empty rows
+    df = df.dropna(subset=["HomeTeam", "AwayTeam"]).reset_index(drop=True)
+    columns = {}
+    for col in df.columns:
+        if col == "Date":
+            # the source files mix 2 and 4 digit years
+            date = df[col].astype(str)
+            columns[col] = pd.to_datetime(
+                date, format="%d/%m/%y", errors="coerce"
+            ).fillna(pd.to_datetime(date, format="%d/%m/%Y", errors="coerce"))
+        elif col in _CATEGORY_COLS:
+            columns[col] = df[col].astype("category")
+        elif col in _STRING_COLS:
+            columns[col] = df[col].astype(object)
+        elif col in _INT_COLS and df[col].notna().all():
+            columns[col] = pd.to_numeric(df[col], downcast="integer")
+        else:
+            columns[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    return pd.DataFrame(columns)
+
+
+def season_sort_key(season: str) -> int:
+    """sort seasons like "99-00" before "00-01" by their starting year"""
+    start = int(season[:2])
+    return start + (1900 if start >= 90 else 2000)
+
+
+def partition_path(season: str, path: str = STORE_PATH) -> str:
+    """get the parquet file holding the data of one season"""
+    return os.path.join(path, f"season={season}", "data.parquet")
+
+
+def list_seasons(path: str = STORE_PATH) -> list:
+    """list the seasons in the dataset without reading any data"""
+    seasons = []
+    for name in os.listdir(path):
+        season = name.split("=", 1)[-1]
+        if name.startswith("season=") and os.path.exists(partition_path(season, path)):
+            seasons.append(season)
+    return sorted(seasons, key=season_sort_key)
+
+
+def write_dataset(df: "pd.DataFrame", path: str = STORE_PATH) -> None:
+    """write the dataset partitioned by season, replacing those seasons"""
+    if os.path.isfile(path):
+        # dataset written before it was partitioned
+        os.remove(path)
+    for season, season_df in df.groupby("season", observed=True):
+        file = partition_path(season, path)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        # keep only the teams and referees of this season in the categories
+        season_df = season_df.apply(
+            lambda col: (
+                col.cat.remove_unused_categories()
+                if isinstance(col.dtype, pd.CategoricalDtype)
+                else col
+            )
+        )
+        # write next to the target first, so readers never see a partial file
+        tmp = _temp_path(file)
+        season_df.to_parquet(tmp, index=False)
+        os.replace(tmp, file)
+
+
+def convert_csv_data(
+    csv_path: str = DATA_PATH,
+    path: str = STORE_PATH,
+    summary_path: str = SUMMARY_PATH,
+    ratings_path: str = RATINGS_PATH,
+) -> "pd.DataFrame":
+    """convert the merged csv data to the parquet dataset, its summaries and
+    ratings"""
+    df, _ = normalize_schema(pd.read_csv(csv_path, low_memory=False))
+    write_dataset(df, path)
+    materialize_summaries(df, path=summary_path, store_path=path)
+    update_ratings(df, ratings_path)
+    return df
+
+
+def ensure_dataset(
+    path: str = STORE_PATH,
+    csv_path: str = DATA_PATH,
+    summary_path: str = SUMMARY_PATH,
+    ratings_path: str = RATINGS_PATH,
+) -> None:
+    """convert the csv data when the dataset is missing or older than it
+
+    concurrent callers convert it once, the others wait for it. The check is
+    made under the lock too, a conversion in progress has some seasons
+    written already and would look complete.
+    """
+    with _CONVERT_LOCK:
+        if _dataset_is_stale(path, csv_path):
+            convert_csv_data(csv_path, path, summary_path, ratings_path)
+
+
+def _dataset_is_stale(path: str, csv_path: str) -> bool:
+    seasons = list_seasons(path) if os.path.isdir(path) else []
+    if not seasons:
+        return True
+    if not os.path.exists(csv_path):
+        return False
+    store_mtime = min(
+        os.path.getmtime(partition_path(season, path)) for season in seasons
+    )
+    return os.path.getmtime(csv_path) > store_mtime
+
+
+def load_dataset(
+    seasons=None,
+    columns: list = None,
+    path: str = STORE_PATH,
+    csv_path: str = DATA_PATH,
+    summary_path: str = SUMMARY_PATH,
+    ratings_path: str = RATINGS_PATH,
+) -> "pd.DataFrame":
+    """load the columns of one season, a list of seasons or all of them
+
+    only the partitions of the requested seasons are read. Columns a season
+    does not have (e.g. odds of later bookmakers) are filled with NaN. A
+    missing or stale dataset is converted first, with its summaries and
+    ratings.
+    """
+    ensure_dataset(path, csv_path, summary_path, ratings_path)
+    if seasons is None:
+        seasons = list_seasons(path)
+    elif isinstance(seasons, str):
+        seasons = [seasons]
+
+    dfs = []
+    for season in seasons:
+        file = partition_path(season, path)
+        file_columns = columns
+        if columns is not None:
+            available = set(pq.read_schema(file).names)
+            file_columns = [col for col in columns if col in available]
+        dfs.append(pd.read_parquet(file, columns=file_columns, memory_map=True))
 
     df = pd.concat(dfs, ignore_index=True)
-    # df = df.astype({"Time": str})
-    df.to_csv("data/bet_data.csv", index=False)
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    # concat turns categoricals with different categories into objects
+    for col in _CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
     return df
 
 
+_TABLE_COLS = [
+    "team",
+    "played",
+    "won",
+    "draw",
+    "lost",
+    "goals_scored",
+    "goals_conceded",
+    "gd",
+    "points",
+    "goals_scored_pg",
+    "goals_conceded_pg",
+    "corners_for",
+    "corners_against",
+    "shots_made",
+    "shots_allowed",
+    "shots_to_score_a_goal",
+    "shots_to_concede_a_goal",
+    "yellow_cards",
+    "red_cards_total",
+    "fouls_commited",
+    "fouls_suffered",
+]
+# columns that are added up between the home and away tables
+_TABLE_SUM_COLS = [
+    "played",
+    "won",
+    "draw",
+    "lost",
+    "goals_scored",
+    "goals_conceded",
+    "gd",
+    "red_cards_total",
+]
+# per match columns that are averaged between the home and away tables
+_TABLE_AVG_COLS = [
+    "goals_scored_pg",
+    "goals_conceded_pg",
+    "corners_for",
+    "corners_against",
+    "shots_made",
+    "shots_allowed",
+    "shots_to_score_a_goal",
+    "shots_to_concede_a_goal",
+    "yellow_cards",
+    "fouls_commited",
+    "fouls_suffered",
+]
+# source columns of a team's own side and of its opponent's side
+_SIDE_COLS = {
+    "home": {
+        "team": "HomeTeam",
+        "goals_for": "FTHG",
+        "goals_against": "FTAG",
+        "corners_for": "HC",
+        "corners_against": "AC",
+        "shots_made": "HS",
+        "shots_allowed": "AS",
+        "yellow_cards": "HY",
+        "red_cards": "HR",
+        "fouls_commited": "HF",
+        "fouls_suffered": "AF",
+    },
+    "away": {
+        "team": "AwayTeam",
+        "goals_for": "FTAG",
+        "goals_against": "FTHG",
+        "corners_for": "AC",
+        "corners_against": "HC",
+        "shots_made": "AS",
+        "shots_allowed": "HS",
+        "yellow_cards": "AY",
+        "red_cards": "AR",
+        "fouls_commited": "AF",
+        "fouls_suffered": "HF",
+    },
+}
+
+
+def _calc_tables(df: "pd.DataFrame", by: list = ()) -> dict:
+    """calculate the home, away and overall tables in one pass
+
+    with `by` (e.g. ["season"]) the tables of every group are computed by
+    the same groupby and indexed by (group, team).
+    """
+    by = list(by)
+    index = _table_index(df, by)
+    df_home = _calc_side_table(df, "home", index, by)
+    df_away = _calc_side_table(df, "away", index, by)
+
+    # overall table: add the aligned home and away frames together
+    df_overall = df_home[_TABLE_SUM_COLS] + df_away[_TABLE_SUM_COLS]
+    df_overall["points"] = df_overall["won"] * 3 + df_overall["draw"]
+    # per match stats are weighted by the number of matches played
+    df_overall[_TABLE_AVG_COLS] = (
+        df_home[_TABLE_AVG_COLS].mul(df_home["played"], axis=0)
+        + df_away[_TABLE_AVG_COLS].mul(df_away["played"], axis=0)
+    ).div(df_overall["played"], axis=0)
+    df_overall["team"] = df_home["team"]
+
+    return {
+        "home": _rank_table(df_home, by),
+        "away": _rank_table(df_away, by),
+        "overall": _rank_table(df_overall, by),
+    }
+
+
+def _table_index(df: "pd.DataFrame", by: list) -> "pd.Index":
+    """get the sorted teams, or (group, team) pairs, of the tables"""
+    if not by:
+        return pd.Index(
+            sorted(set(df["HomeTeam"].astype(str)) | set(df["AwayTeam"].astype(str)))
+        )
+    keys = by + ["team"]
+    pairs = (
+        pd.concat(
+            [
+                df[by + ["HomeTeam"]].set_axis(keys, axis=1),
+                df[by + ["AwayTeam"]].set_axis(keys, axis=1),
+            ],
+            ignore_index=True,
+        )
+        .astype(str)
+        .drop_duplicates()
+        .sort_values(keys)
+    )
+    return pd.MultiIndex.from_frame(pairs, names=by + [None])
+
+
+def _calc_side_table(
+    df: "pd.DataFrame", side: str, index: "pd.Index", by: list = ()
+) -> "pd.DataFrame":
+    """calculate the home or away table with a single groupby"""
+    c = _SIDE_COLS[side]
+    goals_for = df[c["goals_for"]]
+    goals_against = df[c["goals_against"]]
+    matches = pd.DataFrame(
+        {
+            "won": goals_for > goals_against,
+            "draw": goals_for == goals_against,
+            "lost": goals_for < goals_against,
+            "goals_for": goals_for,
+            "goals_against": goals_against,
+            "corners_for": df[c["corners_for"]],
+            "corners_against": df[c["corners_against"]],
+            "shots_made": df[c["shots_made"]],
+            "shots_allowed": df[c["shots_allowed"]],
+            "yellow_cards": df[c["yellow_cards"]],
+            "red_cards": df[c["red_cards"]],
+            "fouls_commited": df[c["fouls_commited"]],
+            "fouls_suffered": df[c["fouls_suffered"]],
+        }
+    )
+    keys = [df[col].astype(str) for col in list(by) + [c["team"]]]
+    table = matches.groupby(keys, observed=True).agg(
+        played=("won", "size"),
+        won=("won", "sum"),
+        draw=("draw", "sum"),
+        lost=("lost", "sum"),
+        goals_scored=("goals_for", "sum"),
+        goals_conceded=("goals_against", "sum"),
+        goals_scored_pg=("goals_for", "mean"),
+        goals_conceded_pg=("goals_against", "mean"),
+        corners_for=("corners_for", "mean"),
+        corners_against=("corners_against", "mean"),
+        shots_made=("shots_made", "mean"),
+        shots_allowed=("shots_allowed", "mean"),
+        yellow_cards=("yellow_cards", "mean"),
+        red_cards_total=("red_cards", "sum"),
+        fouls_commited=("fouls_commited", "mean"),
+        fouls_suffered=("fouls_suffered", "mean"),
+    )
+    # teams without a match on this side still get a row
+    table = table.reindex(index)
+    count_cols = [
+        "played",
+        "won",
+        "draw",
+        "lost",
+        "goals_scored",
+        "goals_conceded",
+        "red_cards_total",
+    ]
+    table[count_cols] = table[count_cols].fillna(0).astype(int)
+    table.index.names = index.names
+
+    table["team"] = table.index.get_level_values(-1)
+    table["gd"] = table["goals_scored"] - table["goals_conceded"]
+    table["points"] = table["won"] * 3 + table["draw"]
+    table["shots_to_score_a_goal"] = table["shots_made"] / table["goals_scored_pg"]
+    table["shots_to_concede_a_goal"] = (
+        table["shots_allowed"] / table["goals_conceded_pg"]
+    )
+    return table
+
+
+def _rank_table(table: "pd.DataFrame", by: list = ()) -> "pd.DataFrame":
+    """rank teams by points, gd, goals_scored, within each group of `by`"""
+    by = list(by)
+    table = table[_TABLE_COLS].copy()
+    table["rank_points"] = _rank_points(table)
+    table["rank"] = _dense_rank(table["rank_points"], by)
+    table.sort_values(by=by + ["rank"], inplace=True)
+    return table
+
+
+def _rank_points(table: "pd.DataFrame") -> "pd.Series":
+    return table["points"] * 1_000_000 + table["gd"] * 1000 + table["goals_scored"]
+
+
+def _dense_rank(rank_points: "pd.Series", by: list = ()) -> "pd.Series":
+    if by:
+        rank_points = rank_points.groupby(level=list(by))
+    return rank_points.rank(method="dense", ascending=False).astype(int)
+
+
+_MATCHDAY_COLS = [
+    "played",
+    "won",
+    "draw",
+    "lost",
+    "goals_scored",
+    "goals_conceded",
+    "gd",
+    "points",
+    "form",
+    "rank",
+]
+
+
+def _calc_matchday_tables(df: "pd.DataFrame", form: int = 5) -> "pd.DataFrame":
+    """calculate the overall table after every matchday in one pass
+
+    the matches of every team are sorted by date and summed cumulatively, the
+    n-th matchday of a team is its n-th match. A team that has played fewer
+    matches keeps its last row. `form` holds the points of the last `form`
+    matches. Indexed by (matchday, team).
+    """
+    df = df[_played(df)]
+    home_goals = df["FTHG"].to_numpy(dtype=int)
+    away_goals = df["FTAG"].to_numpy(dtype=int)
+    goals_scored = np.concatenate([home_goals, away_goals])
+    goals_conceded = np.concatenate([away_goals, home_goals])
+    # one row per team and match
+    matches = pd.DataFrame(
+        {
+            "team": np.concatenate(
+                [df["HomeTeam"].astype(str), df["AwayTeam"].astype(str)]
+            ),
+            "date": np.concatenate([df["Date"].to_numpy(), df["Date"].to_numpy()]),
+            "won": (goals_scored > goals_conceded).astype(int),
+            "draw": (goals_scored == goals_conceded).astype(int),
+            "lost": (goals_scored < goals_conceded).astype(int),
+            "goals_scored": goals_scored,
+            "goals_conceded": goals_conceded,
+        }
+    ).sort_values(["team", "date"], kind="stable", ignore_index=True)
+
+    by_team = matches.groupby("team", sort=False)
+    tables = by_team[["won", "draw", "lost", "goals_scored", "goals_conceded"]].cumsum()
+    tables["played"] = by_team.cumcount() + 1
+    tables["gd"] = tables["goals_scored"] - tables["goals_conceded"]
+    tables["points"] = tables["won"] * 3 + tables["draw"]
+    # points now less the points `form` matches ago
+    tables["form"] = tables["points"] - tables.groupby(matches["team"])["points"].shift(
+        form, fill_value=0
+    )
+    tables.index = pd.MultiIndex.from_arrays([tables["played"], matches["team"]])
+
+    # every team at every matchday, carrying the last played one forward
+    teams = sorted(matches["team"].unique())
+    matchdays = range(1, tables["played"].max() + 1 if len(tables) else 1)
+    grid = pd.MultiIndex.from_product([teams, matchdays])
+    tables = tables.swaplevel().reindex(grid).groupby(level=0).ffill()
+    tables = tables.fillna(0).astype(int).swaplevel().sort_index()
+    tables.index.names = ["matchday", None]
+
+    tables["rank"] = _dense_rank(_rank_points(tables), ["matchday"])
+    tables.sort_values(by=["matchday", "rank"], kind="stable", inplace=True)
+    return tables[_MATCHDAY_COLS]
+
+
+_TEAM_STATS_COLS = [
+    "category",
+    "mp",
+    "win",
+    "draw",
+    "lost",
+    "gs",
+    "gc",
+    "total_goals",
+    "position",
+    "points",
+    "avg_points",
+    "avg_gs",
+    "avg_gc",
+    "avg_goals",
+    "corners_for",
+    "corners_against",
+    "corners_total",
+    "shots_on_goal_f",
+    "shots_on_goal_a",
+    "fouls_commited",
+    "fouls_suffered",
+    "fouls_total",
+]
+
+
+def _calc_team_stats(category: str, table: "pd.DataFrame") -> "pd.DataFrame":
+    """get the team stats of every team in a ranking table"""
+    stats = pd.DataFrame(
+        {
+            "category": category,
+            "mp": table["played"],
+            "win": table["won"],
+            "draw": table["draw"],
+            "lost": table["lost"],
+            "gs": table["goals_scored"],
+            "gc": table["goals_conceded"],
+            "total_goals": table["goals_scored"] + table["goals_conceded"],
+            "position": table["rank"],
+            "points": table["points"],
+            "avg_points": table["points"] / table["played"],
+            "avg_gs": table["goals_scored_pg"],
+            "avg_gc": table["goals_conceded_pg"],
+            "avg_goals": table["goals_scored_pg"] + table["goals_conceded_pg"],
+            "corners_for": table["corners_for"],
+            "corners_against": table["corners_against"],
+            "corners_total": table["corners_for"] + table["corners_against"],
+            "shots_on_goal_f": table["shots_to_score_a_goal"],
+            "shots_on_goal_a": table["shots_to_concede_a_goal"],
+            "fouls_commited": table["fouls_commited"],
+            "fouls_suffered": table["fouls_suffered"],
+            "fouls_total": table["fouls_commited"] + table["fouls_suffered"],
+        },
+        index=table.index,
+    )
+    return stats[_TEAM_STATS_COLS]
+
+
+def _calc_score_grid(df: "pd.DataFrame", index: list) -> "pd.DataFrame":
+    """pivot the full time scores into a home team x away team grid"""
+    played = df.dropna(subset=["FTHG", "FTAG"])
+    scores = (
+        played["FTHG"].astype(int).astype(str)
+        + "-"
+        + played["FTAG"].astype(int).astype(str)
+    )
+    keys = [played[col].astype(str) for col in index + ["AwayTeam"]]
+    return scores.groupby(keys, observed=True).first().unstack("AwayTeam")
+
+
+def calc_result_matrices(data: "pd.DataFrame", missing: str = "") -> "pd.DataFrame":
+    """get the result matrices of all seasons stacked in one frame
+
+    every season gets a block of rows, one per team, over the columns of all
+    teams in the dataset. Cells of teams outside of that season are left
+    empty (NaN), unplayed fixtures are filled with `missing`.
+    """
+    grid = _calc_score_grid(data, ["season", "HomeTeam"])
+    pairs = (
+        pd.concat(
+            [
+                data[["season", "HomeTeam"]].set_axis(["season", "Teams"], axis=1),
+                data[["season", "AwayTeam"]].set_axis(["season", "Teams"], axis=1),
+            ],
+            ignore_index=True,
+        )
+        .astype(str)
+        .drop_duplicates()
+        .sort_values(["season", "Teams"])
+    )
+    rows = pd.MultiIndex.from_frame(pairs)
+    in_season = pd.crosstab(pairs["season"], pairs["Teams"]) > 0
+    grid = grid.reindex(index=rows, columns=in_season.columns)
+
+    # fixtures between two teams of the same season that were not played yet
+    expected = in_season.reindex(pairs["season"]).to_numpy()
+    grid = grid.mask(expected & grid.isna().to_numpy(), missing)
+    diagonal = pairs["Teams"].to_numpy()[:, None] == in_season.columns.to_numpy()
+    grid = grid.mask(diagonal, "-")
+    grid.columns.name = None
+
+    return grid.reset_index()
+
+
+# full time results and the index labels of their summary rows
+_FT_RESULTS = {"H": "home_win", "D": "draw", "A": "away_win"}
+# bookmakers of summary_ft_results and the prefix of their 1X2 odds columns
+_FT_ODDS = {"pin": "PS", "bet": "B365"}
+
+
+def find_odds_columns(columns: list) -> dict:
+    """find the bookmakers with home, draw and away odds columns
+
+    returns a dict of prefix -> [home, draw, away] columns in the order of
+    `columns`, e.g. "B365" -> ["B365H", "B365D", "B365A"]. Closing odds have
+    their own prefix, e.g. "PSC" for the closing odds of "PS".
+    """
+    columns = set(map(str, columns))
+    triplets = {}
+    for col in sorted(columns):
+        prefix = col[:-1]
+        results = [prefix + result for result in _FT_RESULTS]
+        if col.endswith("H") and all(result in columns for result in results):
+            triplets[prefix] = results
+    return triplets
+
+
+_ODDS_METRICS = [
+    "avg_odds",
+    "avg_winodds",
+    "implied_pct",
+    "fair_pct",
+    "actual_pct",
+]
+
+
+def _calc_odds_summary(df: "pd.DataFrame", bookmakers: list = None) -> "pd.DataFrame":
+    """get the 1X2 odds of every bookmaker and season in one pass
+
+    the odds of all bookmakers are stacked in a (match, bookmaker, result)
+    array and every metric is averaged by one groupby over the seasons.
+    Implied, fair (without the margin) and actual probabilities and the
+    overround only count the matches with all three odds of a bookmaker.
+    Returns a long frame indexed by (season, bookmaker, result) with a row
+    for every bookmaker that has odds in the season.
+    """
+    triplets = find_odds_columns(df.columns)
+    if bookmakers is not None:
+        # bookmakers without odds in df are left out
+        triplets = {book: triplets[book] for book in bookmakers if book in triplets}
+    books = list(triplets)
+    results = list(_FT_RESULTS)
+    num_of_matches = len(df.index)
+
+    odds = (
+        df[[col for cols in triplets.values() for col in cols]]
+        .to_numpy(dtype=float)
+        .reshape(num_of_matches, len(books), len(results))
+    )
+    happened = (df["FTR"].astype(str).to_numpy()[:, None] == np.array(results))[
+        :, None, :
+    ]
+    complete = ~np.isnan(odds).any(axis=2, keepdims=True)
+    implied = np.where(complete, 1 / odds, np.nan)
+    book_sum = implied.sum(axis=2, keepdims=True)
+    # metric x match x bookmaker x result
+    metrics = np.stack(
+        [
+            odds,
+            np.where(happened, odds, np.nan),
+            implied * 100,
+            implied / book_sum * 100,
+            np.where(complete, happened * 100.0, np.nan),
+            np.broadcast_to((book_sum - 1) * 100, odds.shape),
+            np.broadcast_to(complete, odds.shape).astype(float),
+            (~np.isnan(odds)).astype(float),
+        ]
+    )
+    names = _ODDS_METRICS + ["overround_pct", "matches", "has_odds"]
+    seasons, codes = np.unique(df["season"].astype(str), return_inverse=True)
+    # sums and counts of the values of every season by a one-hot matmul
+    in_season = (codes == np.arange(len(seasons))[:, None]).astype(float)
+    values = metrics.transpose(1, 0, 2, 3).reshape(
+        num_of_matches, len(names) * len(books) * len(results)
+    )
+    valid = ~np.isnan(values)
+    sums = in_season @ np.where(valid, values, 0)
+    counts = in_season @ valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    # season x bookmaker x result x metric
+    shape = (len(seasons), len(names), len(books), len(results))
+    means = means.reshape(shape).transpose(0, 2, 3, 1).reshape(-1, len(names))
+    sums = sums.reshape(shape).transpose(0, 2, 3, 1).reshape(-1, len(names))
+    summary = pd.DataFrame(
+        means,
+        columns=names,
+        index=pd.MultiIndex.from_product(
+            [list(seasons), books, list(_FT_RESULTS.values())],
+            names=["season", "bookmaker", "result"],
+        ),
+    )
+    summary["matches"] = sums[:, names.index("matches")].astype(int)
+    has_odds = sums[:, names.index("has_odds")] > 0
+    summary["closing"] = [
+        book.endswith("C") and book[:-1] in triplets
+        for book in summary.index.get_level_values("bookmaker")
+    ]
+    summary = summary[has_odds]
+    return summary[["matches", "closing"] + _ODDS_METRICS + ["overround_pct"]]
+
+
+def _calc_ft_results(df: "pd.DataFrame") -> "pd.DataFrame":
+    """get the full time results summary of every season, indexed by
+    (season, result)"""
+    season = df["season"].astype(str).rename("season")
+    ftr = df["FTR"].astype(str)
+    results = list(_FT_RESULTS)
+
+    match_cnt = pd.crosstab(season, ftr).reindex(columns=results, fill_value=0)
+    metrics = {
+        "match_cnt": match_cnt,
+        "match_pct": match_cnt.div(match_cnt.sum(axis=1), axis=0) * 100,
+    }
+    odds = _calc_odds_summary(df, list(_FT_ODDS.values()))
+    odds = odds[["avg_odds", "avg_winodds"]].unstack(["bookmaker", "result"])
+    for col in ["avg_odds", "avg_winodds"]:
+        for name, prefix in _FT_ODDS.items():
+            # seasons without odds of the bookmaker have no rows
+            metrics[f"{col}_{name}"] = odds.reindex(
+                columns=pd.MultiIndex.from_product(
+                    [[col], [prefix], list(_FT_RESULTS.values())]
+                )
+            )
+    metrics["fair_odds"] = 100 / metrics["match_pct"]
+
+    seasons = match_cnt.index
+    return pd.DataFrame(
+        {
+            name: frame.reindex(seasons).to_numpy().ravel()
+            for name, frame in metrics.items()
+        },
+        index=pd.MultiIndex.from_product(
+            [seasons, list(_FT_RESULTS.values())], names=["season", None]
+        ),
+    )
+
+
+def scoreline_histogram(df: "pd.DataFrame", size: int = None) -> "np.ndarray":
+    """count the matches of every full time score with a single bincount
+
+    hist[i, j] is the number of matches that ended i-j. The grid is large
+    enough for the highest score unless a size is given, higher scores are
+    then left out.
+    """
+    home, away = _goals_arrays(df)
+    if size is None:
+        size = int(max(home.max(initial=0), away.max(initial=0))) + 1
+    inside = (home < size) & (away < size)
+    cells = home[inside] * size + away[inside]
+    return np.bincount(cells, minlength=size * size).reshape(size, size)
+
+
+def scoreline_histograms(data: "pd.DataFrame", size: int = None) -> tuple:
+    """get the scoreline histograms of all seasons with a single bincount
+
+    returns the seasons and an array of their histograms, one per season.
+    """
+    home, away = _goals_arrays(data)
+    if size is None:
+        size = int(max(home.max(initial=0), away.max(initial=0))) + 1
+    codes, seasons = pd.factorize(data.loc[_played(data), "season"], sort=True)
+    inside = (home < size) & (away < size)
+    cells = (codes[inside] * size + home[inside]) * size + away[inside]
+    hist = np.bincount(cells, minlength=len(seasons) * size * size)
+    return list(seasons), hist.reshape(len(seasons), size, size)
+
+
+def _played(df: "pd.DataFrame") -> "pd.Series":
+    return df["FTHG"].notna() & df["FTAG"].notna()
+
+
+def _goals_arrays(df: "pd.DataFrame") -> tuple:
+    played = df.loc[_played(df), ["FTHG", "FTAG"]]
+    return (
+        played["FTHG"].to_numpy(dtype=np.intp),
+        played["FTAG"].to_numpy(dtype=np.intp),
+    )
+
+
+def _calc_goal_spread(
+    hist: "np.ndarray", max_goals: int = 3, seasons: list = None
+) -> "pd.DataFrame":
+    """get the spread of scores up to max_goals-max_goals from a histogram
+
+    with a stack of histograms and their seasons, the spreads of all seasons
+    are indexed by (season, score).
+    """
+    hists = hist.reshape((-1,) + hist.shape[-2:])
+    size = max_goals + 1
+    grid = np.zeros((len(hists), size, size), dtype=hists.dtype)
+    n = min(size, hists.shape[1])
+    grid[:, :n, :n] = hists[:, :n, :n]
+
+    num_of_matches = hists.sum(axis=(1, 2))
+    match_cnt = np.column_stack(
+        [grid.reshape(len(hists), -1), num_of_matches - grid.sum(axis=(1, 2))]
+    )
+    index = [f"{i}-{j}" for i in range(size) for j in range(size)]
+    index.append(f"{size}+")
+
+    return_df = _goal_frame(match_cnt, num_of_matches, index, seasons)
+    return_df["fair_odds"] = return_df["fair_odds"].round(2)
+    if seasons is None:
+        return_df.reset_index(inplace=True)
+    return return_df
+
+
+def _calc_goal_markets(
+    hist: "np.ndarray", lines: tuple = GOAL_LINES, seasons: list = None
+) -> "pd.DataFrame":
+    """get the under/over goal markets from a histogram
+
+    with a stack of histograms and their seasons, the markets of all seasons
+    are indexed by (season, market).
+    """
+    hists = hist.reshape((-1,) + hist.shape[-2:])
+    size = hists.shape[1]
+    # matches by total goals, one row per histogram
+    total_goals = np.add.outer(np.arange(size), np.arange(size)).ravel()
+    one_hot = total_goals[:, None] == np.arange(2 * size - 1)
+    totals = hists.reshape(len(hists), -1) @ one_hot
+    # cumulative[:, k] is the number of matches with fewer than k goals
+    cumulative = np.column_stack(
+        [np.zeros(len(hists), dtype=totals.dtype), np.cumsum(totals, axis=1)]
+    )
+    lines = np.asarray(lines, dtype=float)
+    under = cumulative[:, np.clip(np.ceil(lines).astype(int), 0, totals.shape[1])]
+
+    num_of_matches = hists.sum(axis=(1, 2))
+    match_cnt = np.stack([under, num_of_matches[:, None] - under], axis=2)
+    index = [f"{side} {line} goals" for line in lines for side in ("Under", "Over")]
+    return _goal_frame(
+        match_cnt.reshape(len(hists), -1), num_of_matches, index, seasons
+    )
+
+
+def _goal_frame(
+    match_cnt: "np.ndarray", num_of_matches: "np.ndarray", index: list, seasons: list
+) -> "pd.DataFrame":
+    """get the match counts, percentages and fair odds of histogram rows"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        match_pct = match_cnt / num_of_matches[:, None] * 100
+        fair_odds = 100 / match_pct
+    if seasons is not None:
+        index = pd.MultiIndex.from_product([seasons, index], names=["season", None])
+    return pd.DataFrame(
+        {
+            "match_cnt": match_cnt.ravel(),
+            "match_pct": match_pct.ravel(),
+            "fair_odds": fair_odds.ravel(),
+        },
+        index=index,
+    )
+
+
+# metric: (home team column, away team column) of summary_stats
+STAT_SPECS = {
+    "corners": ("HC", "AC"),
+    "shots": ("HS", "AS"),
+    "shots_on_target": ("HST", "AST"),
+    "yellow_cards": ("HY", "AY"),
+    "red_cards": ("HR", "AR"),
+    "fouls": ("HF", "AF"),
+}
+# column suffix: reduction over the matches, skipping missing values
+STAT_AGGS = {
+    "cnt": np.nansum,
+    "per_game": np.nanmean,
+    "max": np.nanmax,
+    "min": np.nanmin,
+}
+
+
+def _calc_summary_stats(df: "pd.DataFrame", specs: dict = STAT_SPECS) -> "pd.DataFrame":
+    """reduce the home, away and total columns of every metric at once"""
+    metrics = list(specs)
+    home_cols = [specs[metric][0] for metric in metrics]
+    away_cols = [specs[metric][1] for metric in metrics]
+    home = df[home_cols].to_numpy(dtype=float)
+    away = df[away_cols].to_numpy(dtype=float)
+    # sides x matches x metrics
+    block = np.stack([home, away, home + away])
+
+    reduced = {suffix: func(block, axis=1) for suffix, func in STAT_AGGS.items()}
+    reduced["per_game"] = np.round(reduced["per_game"], 2)
+    # sides x (metric, suffix), grouped by metric
+    values = np.stack([reduced[suffix] for suffix in STAT_AGGS], axis=2)
+    df_cols = [f"{metric}_{suffix}" for metric in metrics for suffix in STAT_AGGS]
+    return_df = pd.DataFrame(
+        values.reshape(3, -1),
+        index=["Home team", "Away team", "Total"],
+        columns=df_cols,
+    )
+
+    # counts, max and min stay integers for integer stats
+    for metric, home_col, away_col in zip(metrics, home_cols, away_cols):
+        if all(pd.api.types.is_integer_dtype(df[col]) for col in (home_col, away_col)):
+            int_cols = [f"{metric}_{suffix}" for suffix in ("cnt", "max", "min")]
+            return_df[int_cols] = return_df[int_cols].astype("int64")
+
+    return_df.reset_index(inplace=True)
+    return return_df
+
+
+def _copy_result(result):
+    """copy cached frames so that callers can modify what they get back"""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return result.copy()
+    if isinstance(result, dict):
+        return {k: _copy_result(v) for k, v in result.items()}
+    return result
+
+
+def _hashable(value):
+    """turn list, array and dict arguments into cache key parts"""
+    if isinstance(value, (list, np.ndarray)):
+        return tuple(value)
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    return value
+
+
+def _cached_result(method):
+    """share the results of a SeasonSummary method through RESULT_CACHE
+
+    Results are keyed by (dataset fingerprint, columns, season, method,
+    arguments), so every session looking at the same season shares one
+    computation. The pages load a season with different columns under the
+    same fingerprint, a result of fewer columns must not be served to a
+    summary holding more of them.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (
+            self.fingerprint,
+            self.columns,
+            self.season,
+            method.__qualname__,
+        ) + tuple(_hashable(v) for v in list(bound.arguments.values())[1:])
+        result = RESULT_CACHE.get_or_compute(key, lambda: method(self, *args, **kwargs))
+        return _copy_result(result)
+
+    return wrapper
+
+
+class TeamIndex:
+    """inverted index from every team to the rows of its home and away matches
+
+    built with one pass over the data, a lookup then costs O(matches of that
+    team) instead of a scan of the whole frame. The data can hold one season
+    or all of them.
+    """
+
+    def __init__(self, data: "pd.DataFrame"):
+        self.data = data
+        self._home = data.groupby("HomeTeam", observed=True).indices
+        self._away = data.groupby("AwayTeam", observed=True).indices
+        self._empty = np.array([], dtype=np.intp)
+
+    def __repr__(self):
+        return f"TeamIndex(teams = {len(self.teams)}, matches = {len(self.data.index)})"
+
+    @property
+    def teams(self) -> list:
+        return sorted(set(self._home) | set(self._away))
+
+    def home_rows(self, team: str) -> "np.ndarray":
+        """row positions of the team's home matches"""
+        return self._home.get(team, self._empty)
+
+    def away_rows(self, team: str) -> "np.ndarray":
+        """row positions of the team's away matches"""
+        return self._away.get(team, self._empty)
+
+    def team_rows(self, team: str) -> "np.ndarray":
+        """row positions of all matches of the team, in data order"""
+        return np.union1d(self.home_rows(team), self.away_rows(team))
+
+    def team_matches(self, team: str, venue: str = "all") -> "pd.DataFrame":
+        """get the home, away or all matches of a team"""
+        rows = {
+            "home": self.home_rows,
+            "away": self.away_rows,
+            "all": self.team_rows,
+        }[
+            venue
+        ](team)
+        return self.data.iloc[rows]
+
+    def head_to_head(self, team: str, opponent: str) -> "pd.DataFrame":
+        """get the matches between two teams, at either venue"""
+        rows = np.union1d(
+            np.intersect1d(self.home_rows(team), self.away_rows(opponent)),
+            np.intersect1d(self.home_rows(opponent), self.away_rows(team)),
+        )
+        return self.data.iloc[rows]
+
+    def history(self, team: str, seasons: list = None) -> "pd.DataFrame":
+        """get the matches of a team over all or some of the seasons"""
+        rows = self.team_rows(team)
+        if seasons is not None:
+            season_values = self.data["season"].to_numpy()[rows]
+            rows = rows[np.isin(season_values, seasons)]
+        return self.data.iloc[rows]
+
+
 class SeasonSummary:
-    def __init__(self, data, season):
-        self.data = data[data["season"] == season]
+    def __init__(self, data, season, fingerprint: str = None):
+        # rows of the season in data, its columns are only sliced when a
+        # method needs them, see _view
+        self._source = data
+        self._rows = np.flatnonzero((data["season"] == season).to_numpy())
+        self._columns = {}
+        self._data = None
         self.season = season
-        self.num_of_matches = len(self.data.index)
+        self.num_of_matches = len(self._rows)
+        self._fingerprint = fingerprint
+        self._tables = None
+        self._team_index = None
+        self._histogram = None
 
     def __repr__(self):
         return f"SeasonSummary(data = {self.data}, season = {self.season})"
 
-    def get_result_matrix(self) -> "pd.DataFrame":
-        """get the result matrict for a single season"""
-        teams = self.data["HomeTeam"].unique().tolist()
-        teams.sort()
-        results = []
-
-        for team in teams:
-            record = {"Teams": team}
-            for opponent in teams:
-                if team == opponent:
-                    score = "-"
-                else:
-                    filt = self.data["HomeTeam"].eq(team) & self.data["AwayTeam"].eq(
-                        opponent
-                    )
-                    home_score = int(self.data.loc[filt, "FTHG"].tolist()[0])
-                    away_score = int(self.data.loc[filt, "FTAG"].tolist()[0])
-                    score = f"{home_score}-{away_score}"
-                record[opponent] = score
-            results.append(record)
-
-        return pd.DataFrame.from_records(results)
+    @property
+    def data(self) -> "pd.DataFrame":
+        """all the columns of the season, sliced on first use"""
+        if self._data is None:
+            self._data = self._view(columns=self._source.columns)
+        return self._data
+
+    def _view(self, *groups: str, columns: list = ()) -> "pd.DataFrame":
+        """get the season rows of the columns of `groups` and `columns`
+
+        every column is sliced once per instance and shared by the views,
+        columns that are not in the data are left out.
+        """
+        names = [
+            col
+            for col in dict.fromkeys([*columns_for(*groups), *columns])
+            if col in self._source.columns
+        ]
+        missing = [col for col in names if col not in self._columns]
+        if len(self._rows) == len(self._source.index):
+            # the data only holds this season, its columns are used as they are
+            self._columns.update((col, self._source[col]) for col in missing)
+        elif missing:
+            sliced = self._source.iloc[
+                self._rows, self._source.columns.get_indexer(missing)
+            ]
+            self._columns.update(sliced.items())
+        return pd.DataFrame({col: self._columns[col] for col in names}, copy=False)
+
+    def _odds_columns(self, bookmakers: list = None) -> list:
+        """get the home, draw and away odds columns of the bookmakers"""
+        triplets = find_odds_columns(self._source.columns)
+        if bookmakers is None:
+            bookmakers = list(triplets)
+        return [col for book in bookmakers for col in triplets.get(book, [])]
+
+    @property
+    def team_index(self) -> TeamIndex:
+        """index of the matches of every team in the season, built on first use"""
+        if self._team_index is None:
+            self._team_index = TeamIndex(self._view("match", "goals"))
+        return self._team_index
+
+    @property
+    def columns(self) -> tuple:
+        """columns of the data the results are computed from"""
+        return tuple(self._source.columns)
 
+    @property
+    def fingerprint(self) -> str:
+        """fingerprint of the dataset, pass it in to skip hashing the season
+
+        only the columns the methods read are hashed, their slices are shared
+        with the methods.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = dataset_fingerprint(
+                self._view("match", "goals", "stats", columns=self._odds_columns())
+            )
+        return self._fingerprint
+
+    @_cached_result
+    def get_result_matrix(self, missing: str = "") -> "pd.DataFrame":
+        """get the result matrict for a single season
+
+        fixtures that have not been played yet are filled with `missing`
+        """
+        df = self._view("match", "goals")
+        teams = sorted(set(df["HomeTeam"].unique()) | set(df["AwayTeam"].unique()))
+        grid = _calc_score_grid(df, ["HomeTeam"]).reindex(index=teams, columns=teams)
+        grid = grid.fillna(missing).mask(np.eye(len(teams), dtype=bool), "-")
+        grid.index.name = "Teams"
+        grid.columns.name = None
+
+        return grid.reset_index()
+
+    @_cached_result
     def summary_goals(self) -> "pd.DataFrame":
         """get the summary of goals for a single season"""
         # num_of_matches = len(df.index)
+        goals = self._view("goals")
 
         df_idx = ["home_goals", "away_goals", "total_goals"]
         # df_cols = ["ft_cnt, ft_avg, fh_cnt, fh_avg, sh_cnt, sh_avg"]
 
         ft_cnt = np.array(
             [
-                self.data["FTHG"].sum(),
-                self.data["FTAG"].sum(),
-                self.data["FTHG"].sum() + self.data["FTAG"].sum(),
+                goals["FTHG"].sum(),
+                goals["FTAG"].sum(),
+                goals["FTHG"].sum() + goals["FTAG"].sum(),
             ]
         )
         fh_cnt = np.array(
             [
-                self.data["HTHG"].sum(),
-                self.data["HTAG"].sum(),
-                self.data["HTHG"].sum() + self.data["HTAG"].sum(),
+                goals["HTHG"].sum(),
+                goals["HTAG"].sum(),
+                goals["HTHG"].sum() + goals["HTAG"].sum(),
             ]
         )
         sh_cnt = ft_cnt - fh_cnt
@@ -97,689 +1363,361 @@ class SeasonSummary:
 
         return result
 
+    @_cached_result
     def summary_ft_results(self) -> "pd.DataFrame":
         """get the summary of the full time results and their odds"""
-        df_idx = ["home_win", "draw", "away_win"]
-        match_cnt = np.array(
-            [
-                len(self.data[self.data["FTR"] == "H"].index),
-                len(self.data[self.data["FTR"] == "D"].index),
-                len(self.data[self.data["FTR"] == "A"].index),
-            ]
+        df = self._view("match", "goals", columns=self._odds_columns(_FT_ODDS.values()))
+        # NaN rows when the season has no matches
+        index = pd.MultiIndex.from_product(
+            [[str(self.season)], list(_FT_RESULTS.values())]
         )
+        return _calc_ft_results(df).reindex(index).droplevel(0)
 
-        match_pct = match_cnt / sum(match_cnt) * 100
+    @_cached_result
+    def summary_odds(self, bookmakers: list = None) -> "pd.DataFrame":
+        """get the 1X2 odds of every bookmaker, indexed by (bookmaker, result)"""
+        df = self._view("match", "goals", columns=self._odds_columns(bookmakers))
+        odds = _calc_odds_summary(df, bookmakers)
+        # empty when none of the bookmakers priced the season
+        in_season = odds.index.get_level_values("season") == str(self.season)
+        return odds[in_season].droplevel("season")
 
-        avg_odds_pin = np.array(
-            [
-                self.data["PSH"].mean(),
-                self.data["PSD"].mean(),
-                self.data["PSA"].mean(),
-            ]
-        )
-        avg_odds_bet = np.array(
-            [
-                self.data["B365H"].mean(),
-                self.data["B365D"].mean(),
-                self.data["B365A"].mean(),
-            ]
-        )
-        avg_winodds_pin = np.array(
-            [
-                self.data.loc[self.data["FTR"] == "H", "PSH"].mean(),
-                self.data.loc[self.data["FTR"] == "D", "PSD"].mean(),
-                self.data.loc[self.data["FTR"] == "A", "PSA"].mean(),
-            ]
-        )
-        avg_winodds_bet = np.array(
-            [
-                self.data.loc[self.data["FTR"] == "D", "B365D"].mean(),
-                self.data.loc[self.data["FTR"] == "H", "B365H"].mean(),
-                self.data.loc[self.data["FTR"] == "A", "B365A"].mean(),
-            ]
-        )
+    @property
+    def scoreline_histogram(self) -> "np.ndarray":
+        """histogram of the full time scores, built once per instance"""
+        if self._histogram is None:
+            self._histogram = scoreline_histogram(self._view("goals"))
+        return self._histogram
 
-        fair_odds = 100 / match_pct
+    @_cached_result
+    def summary_goal_spread(self, max_goals: int = 3) -> "pd.DataFrame":
+        """get the spread of goals in a match"""
+        return _calc_goal_spread(self.scoreline_histogram, max_goals)
 
-        results = pd.DataFrame(
-            data={
-                "match_cnt": match_cnt,
-                "match_pct": match_pct,
-                "avg_odds_pin": avg_odds_pin,
-                "avg_odds_bet": avg_odds_bet,
-                "avg_winodds_pin": avg_winodds_pin,
-                "avg_winodds_bet": avg_winodds_bet,
-                "fair_odds": fair_odds,
-            },
-            index=df_idx,
-        )
-        return results
+    @_cached_result
+    def summary_goal_markets(self, lines: tuple = GOAL_LINES) -> "pd.DataFrame":
+        """get the goal markets"""
+        return _calc_goal_markets(self.scoreline_histogram, lines)
 
-    def summary_goal_spread(self) -> "pd.DataFrame":
-        """get the spread of goals in a match"""
-        # num_of_matches = len(df.index)
+    @_cached_result
+    def fit_score_model(self) -> PoissonModel:
+        """fit the poisson scoreline model on the matches of the season"""
+        return fit_poisson(self._view("match", "goals"))
 
-        df_cols = ["match_cnt", "match_pct", "fair_odds"]
-        results = {}
-        for i in range(4):
-            for j in range(4):
-                match_cnt = len(
-                    self.data[(self.data["FTHG"] == i) & (self.data["FTAG"] == j)].index
-                )
-                match_pct = match_cnt / self.num_of_matches * 100
-                fair_odds = round(100 / match_pct, 2)
-                score = f"{i}-{j}"
-                results[score] = [match_cnt, match_pct, fair_odds]
-
-        return_df = pd.DataFrame.from_dict(results, orient="index", columns=df_cols)
-        # 4+ matches
-        return_df.loc["4+", "match_cnt"] = (
-            self.num_of_matches - return_df["match_cnt"].sum()
-        )
-        return_df.loc["4+", "match_pct"] = (
-            return_df.loc["4+", "match_cnt"] / self.num_of_matches * 100
+    @_cached_result
+    def summary_stats(self, specs: dict = None) -> "pd.DataFrame":
+        """get the stats of corners, shots, cards and fouls"""
+        specs = STAT_SPECS if specs is None else specs
+        columns = [col for cols in specs.values() for col in cols]
+        return _calc_summary_stats(self._view(columns=columns), specs)
+
+    def calc_main_tables(self, table_type: str = "overall") -> "pd.DataFrame":
+        """calculate the ranking table"""
+        if table_type not in ("overall", "home", "away"):
+            return 0
+
+        return self._main_tables()[table_type].copy()
+
+    def _main_tables(self) -> dict:
+        """get the home, away and overall tables, built once per instance"""
+        if self._tables is None:
+            self._tables = self._calc_all_tables()
+        return self._tables
+
+    @_cached_result
+    def _calc_all_tables(self) -> dict:
+        """calculate the home, away and overall tables in one pass"""
+        return _calc_tables(self._view("match", "goals", "stats"))
+
+    @_cached_result
+    def calc_matchday_tables(self, form: int = 5) -> "pd.DataFrame":
+        """calculate the overall table after every matchday, indexed by
+        (matchday, team), with the points of the last `form` matches"""
+        return _calc_matchday_tables(self._view("match", "goals"), form)
+
+    def calc_matchday_table(self, matchday: int, form: int = 5) -> "pd.DataFrame":
+        """get the overall table after a matchday"""
+        return self.calc_matchday_tables(form).loc[matchday]
+
+    def calc_team_stats(self, team: str) -> "pd.DataFrame":
+        """get the total, home and away stats of a single team"""
+        results = self.calc_all_team_stats().loc[team]
+        results.index.name = None
+        return results
+
+    @_cached_result
+    def calc_all_team_stats(self) -> "pd.DataFrame":
+        """get the total, home and away stats of all teams, indexed by team"""
+        tables = self._main_tables()
+        categories = {"Total": "overall", "Home": "home", "Away": "away"}
+        results = pd.concat(
+            {
+                category: _calc_team_stats(category, tables[table_type])
+                for category, table_type in categories.items()
+            }
         )
-        return_df.loc["4+", "fair_odds"] = round(
-            100 / return_df.loc["4+", "match_pct"], 2
+        # one block per team, ordered as Total, Home, Away
+        teams = sorted(tables["overall"].index)
+        results = results.swaplevel().reindex(
+            pd.MultiIndex.from_product([teams, list(categories)])
         )
-        return_df.reset_index(inplace=True)
-        return return_df
-
-    def summary_goal_markets(self) -> "pd.DataFrame":
-        """get the goal markets"""
-        # num_of_matches = len(df.index)
-        df_cols = ["match_cnt", "match_pct", "fair_odds"]
-        results = {}
-        for goal in np.arange(0.5, 5.5):
+        return results
 
-            match_cnt = len(
-                self.data[(self.data["FTHG"] + self.data["FTAG"] < goal)].index
-            )
-            match_pct = match_cnt / self.num_of_matches * 100
-            fair_odds = 100 / match_pct
-            idx = f"Under {goal} goals"
-            results[idx] = [match_cnt, match_pct, fair_odds]
-            idx = f"Over {goal} goals"
-            results[idx] = [
-                self.num_of_matches - match_cnt,
-                100 - match_pct,
-                100 / (100 - match_pct),
-            ]
 
-        return_df = pd.DataFrame.from_dict(results, orient="index", columns=df_cols)
-        return return_df
+class MultiSeasonSummary:
+    """summaries of every season of the dataset, indexed by season
 
-    def summary_stats(self) -> "pd.DataFrame":
-        """get the stats of corners, shots, cards and fouls"""
+    each summary is one grouped computation over the whole frame, instead
+    of one SeasonSummary and one scan of the data per season.
+    """
 
-        df_cols = [
-            "corners_cnt",
-            "corners_per_game",
-            "corners_max",
-            "corners_min",
-            "shots_cnt",
-            "shots_per_game",
-            "shots_max",
-            "shots_min",
-            "shots_on_target_cnt",
-            "shots_on_target_per_game",
-            "shots_on_target_max",
-            "shots_on_target_min",
-            "yellow_cards_cnt",
-            "yellow_cards_per_game",
-            "yellow_cards_max",
-            "yellow_cards_min",
-            "red_cards_cnt",
-            "red_cards_per_game",
-            "red_cards_max",
-            "red_cards_min",
-            "fouls_cnt",
-            "fouls_per_game",
-            "fouls_max",
-            "fouls_min",
-        ]
+    def __init__(self, data, fingerprint: str = None):
+        self.data = data
+        # results of all seasons, see _cached_result
+        self.season = None
+        self._fingerprint = fingerprint
+        self._tables = None
+        self._histograms = None
 
-        ### corners ####
-        corners_cnt_h = self.data["HC"].sum()
-        corners_cnt_a = self.data["AC"].sum()
-        corners_cnt_t = (self.data["HC"] + self.data["AC"]).sum()
-        corners_avg_h = round(self.data["HC"].mean(), 2)
-        corners_avg_a = round(self.data["AC"].mean(), 2)
-        corners_avg_t = round((self.data["HC"] + self.data["AC"]).mean(), 2)
-        corners_max_h = self.data["HC"].max()
-        corners_max_a = self.data["AC"].max()
-        corners_max_t = (self.data["HC"] + self.data["AC"]).max()
-        corners_min_h = self.data["HC"].min()
-        corners_min_a = self.data["AC"].min()
-        corners_min_t = (self.data["HC"] + self.data["AC"]).min()
-
-        ### shots ####
-        shots_cnt_h = self.data["HS"].sum()
-        shots_cnt_a = self.data["AS"].sum()
-        shots_cnt_t = (self.data["HS"] + self.data["AS"]).sum()
-        shots_avg_h = round(self.data["HS"].mean(), 2)
-        shots_avg_a = round(self.data["AS"].mean(), 2)
-        shots_avg_t = round((self.data["HS"] + self.data["AS"]).mean(), 2)
-        shots_max_h = self.data["HS"].max()
-        shots_max_a = self.data["AS"].max()
-        shots_max_t = (self.data["HS"] + self.data["AS"]).max()
-        shots_min_h = self.data["HS"].min()
-        shots_min_a = self.data["AS"].min()
-        shots_min_t = (self.data["HS"] + self.data["AS"]).min()
-
-        ##t shots on target ###
-        shots_ot_cnt_h = self.data["HST"].sum()
-        shots_ot_cnt_a = self.data["AST"].sum()
-        shots_ot_cnt_t = (self.data["HST"] + self.data["AST"]).sum()
-        shots_ot_avg_h = round(self.data["HST"].mean(), 2)
-        shots_ot_avg_a = round(self.data["AST"].mean(), 2)
-        shots_ot_avg_t = round((self.data["HST"] + self.data["AST"]).mean(), 2)
-        shots_ot_max_h = self.data["HST"].max()
-        shots_ot_max_a = self.data["AST"].max()
-        shots_ot_max_t = (self.data["HST"] + self.data["AST"]).max()
-        shots_ot_min_h = self.data["HST"].min()
-        shots_ot_min_a = self.data["AST"].min()
-        shots_ot_min_t = (self.data["HST"] + self.data["AST"]).min()
-
-        ### yellow cards ###
-        yellow_cards_cnt_h = self.data["HY"].sum()
-        yellow_cards_cnt_a = self.data["AY"].sum()
-        yellow_cards_cnt_t = (self.data["HY"] + self.data["AY"]).sum()
-        yellow_cards_avg_h = round(self.data["HY"].mean(), 2)
-        yellow_cards_avg_a = round(self.data["AY"].mean(), 2)
-        yellow_cards_avg_t = round((self.data["HY"] + self.data["AY"]).mean(), 2)
-        yellow_cards_max_h = self.data["HY"].max()
-        yellow_cards_max_a = self.data["AY"].max()
-        yellow_cards_max_t = (self.data["HY"] + self.data["AY"]).max()
-        yellow_cards_min_h = self.data["HY"].min()
-        yellow_cards_min_a = self.data["AY"].min()
-        yellow_cards_min_t = (self.data["HY"] + self.data["AY"]).min()
-
-        ### red cards ###
-        red_cards_cnt_h = self.data["HR"].sum()
-        red_cards_cnt_a = self.data["AR"].sum()
-        red_cards_cnt_t = (self.data["HR"] + self.data["AR"]).sum()
-        red_cards_avg_h = round(self.data["HR"].mean(), 2)
-        red_cards_avg_a = round(self.data["AR"].mean(), 2)
-        red_cards_avg_t = round((self.data["HR"] + self.data["AR"]).mean(), 2)
-        red_cards_max_h = self.data["HR"].max()
-        red_cards_max_a = self.data["AR"].max()
-        red_cards_max_t = (self.data["HR"] + self.data["AR"]).max()
-        red_cards_min_h = self.data["HR"].min()
-        red_cards_min_a = self.data["AR"].min()
-        red_cards_min_t = (self.data["HR"] + self.data["AR"]).min()
-
-        ### fouls committed ###
-        fouls_cnt_h = self.data["HF"].sum()
-        fouls_cnt_a = self.data["AF"].sum()
-        fouls_cnt_t = (self.data["HF"] + self.data["AF"]).sum()
-        fouls_avg_h = round(self.data["HF"].mean(), 2)
-        fouls_avg_a = round(self.data["AF"].mean(), 2)
-        fouls_avg_t = round((self.data["HF"] + self.data["AF"]).mean(), 2)
-        fouls_max_h = self.data["HF"].max()
-        fouls_max_a = self.data["AF"].max()
-        fouls_max_t = (self.data["HF"] + self.data["AF"]).max()
-        fouls_min_h = self.data["HF"].min()
-        fouls_min_a = self.data["AF"].min()
-        fouls_min_t = (self.data["HF"] + self.data["AF"]).min()
-
-        results = {}
-
-        results["Home team"] = [
-            corners_cnt_h,
-            corners_avg_h,
-            corners_max_h,
-            corners_min_h,
-            shots_cnt_h,
-            shots_avg_h,
-            shots_max_h,
-            shots_min_h,
-            shots_ot_cnt_h,
-            shots_ot_avg_h,
-            shots_ot_max_h,
-            shots_ot_min_h,
-            yellow_cards_cnt_h,
-            yellow_cards_avg_h,
-            yellow_cards_max_h,
-            yellow_cards_min_h,
-            red_cards_cnt_h,
-            red_cards_avg_h,
-            red_cards_max_h,
-            red_cards_min_h,
-            fouls_cnt_h,
-            fouls_avg_h,
-            fouls_max_h,
-            fouls_min_h,
-        ]
+    def __repr__(self):
+        return f"MultiSeasonSummary(data = {self.data})"
 
-        results["Away team"] = [
-            corners_cnt_a,
-            corners_avg_a,
-            corners_max_a,
-            corners_min_a,
-            shots_cnt_a,
-            shots_avg_a,
-            shots_max_a,
-            shots_min_a,
-            shots_ot_cnt_a,
-            shots_ot_avg_a,
-            shots_ot_max_a,
-            shots_ot_min_a,
-            yellow_cards_cnt_a,
-            yellow_cards_avg_a,
-            yellow_cards_max_a,
-            yellow_cards_min_a,
-            red_cards_cnt_a,
-            red_cards_avg_a,
-            red_cards_max_a,
-            red_cards_min_a,
-            fouls_cnt_a,
-            fouls_avg_a,
-            fouls_max_a,
-            fouls_min_a,
-        ]
+    @property
+    def columns(self) -> tuple:
+        """columns of the data the results are computed from"""
+        return tuple(self.data.columns)
 
-        results["Total"] = [
-            corners_cnt_t,
-            corners_avg_t,
-            corners_max_t,
-            corners_min_t,
-            shots_cnt_t,
-            shots_avg_t,
-            shots_max_t,
-            shots_min_t,
-            shots_ot_cnt_t,
-            shots_ot_avg_t,
-            shots_ot_max_t,
-            shots_ot_min_t,
-            yellow_cards_cnt_t,
-            yellow_cards_avg_t,
-            yellow_cards_max_t,
-            yellow_cards_min_t,
-            red_cards_cnt_t,
-            red_cards_avg_t,
-            red_cards_max_t,
-            red_cards_min_t,
-            fouls_cnt_t,
-            fouls_avg_t,
-            fouls_max_t,
-            fouls_min_t,
-        ]
+    @property
+    def fingerprint(self) -> str:
+        """fingerprint of the dataset, pass it in to skip hashing the data"""
+        if self._fingerprint is None:
+            self._fingerprint = dataset_fingerprint(self.data)
+        return self._fingerprint
 
-        return_df = pd.DataFrame.from_dict(results, orient="index", columns=df_cols)
-        return_df.reset_index(inplace=True)
-        return return_df
+    @property
+    def scoreline_histograms(self) -> tuple:
+        """seasons and histograms of their full time scores"""
+        if self._histograms is None:
+            self._histograms = scoreline_histograms(self.data)
+        return self._histograms
 
     def calc_main_tables(self, table_type: str = "overall") -> "pd.DataFrame":
-        """calculate the ranking table"""
-        df = self.data
-
-        cols = [
-            "team",
-            "played",
-            "won",
-            "draw",
-            "lost",
-            "goals_scored",
-            "goals_conceded",
-            "gd",
-            "points",
-            "goals_scored_pg",
-            "goals_conceded_pg",
-            "corners_for",
-            "corners_against",
-            "shots_made",
-            "shots_allowed",
-            "shots_to_score_a_goal",
-            "shots_to_concede_a_goal",
-            "yellow_cards",
-            "red_cards_total",
-            "fouls_commited",
-            "fouls_suffered",
-        ]
+        """calculate the ranking tables of all seasons, indexed by (season, team)"""
+        if self._tables is None:
+            self._tables = self._calc_all_tables()
+        return self._tables[table_type].copy()
 
-        results_home = {}
-        results_away = {}
-        results_overall = {}
-
-        home_teams = df["HomeTeam"].unique().tolist()
-        away_teams = df["AwayTeam"].unique().tolist()
-        teams = list(set(home_teams + away_teams))
-
-        # home table
-        if table_type == "home" or table_type == "overall":
-            for team in teams:
-                team_df = df[df["HomeTeam"] == team]
-                played = len(team_df.index)
-                won = len(team_df[team_df["FTHG"] > team_df["FTAG"]].index)
-                draw = len(team_df[team_df["FTHG"] == team_df["FTAG"]].index)
-                lost = len(team_df[team_df["FTHG"] < team_df["FTAG"]].index)
-                goals_scored = team_df["FTHG"].sum()
-                goals_conceded = team_df["FTAG"].sum()
-                gd = goals_scored - goals_conceded
-                points = won * 3 + draw
-                # additional stats per match
-                goals_scored_pg = team_df["FTHG"].mean()
-                goals_conceded_pg = team_df["FTAG"].mean()
-                corners_for = team_df["HC"].mean()
-                corners_against = team_df["AC"].mean()
-                shots_made = team_df["HS"].mean()
-                shots_allowed = team_df["AS"].mean()
-                shots_to_score_a_goal = shots_made / goals_scored_pg
-                shots_to_concede_a_goal = shots_allowed / goals_conceded_pg
-                yellow_cards = team_df["HY"].mean()
-                red_cards_total = team_df["HR"].sum()
-                fouls_commited = team_df["HF"].mean()
-                fouls_suffered = team_df["AF"].mean()
-                results_home[team] = [
-                    team,
-                    played,
-                    won,
-                    draw,
-                    lost,
-                    goals_scored,
-                    goals_conceded,
-                    gd,
-                    points,
-                    goals_scored_pg,
-                    goals_conceded_pg,
-                    corners_for,
-                    corners_against,
-                    shots_made,
-                    shots_allowed,
-                    shots_to_score_a_goal,
-                    shots_to_concede_a_goal,
-                    yellow_cards,
-                    red_cards_total,
-                    fouls_commited,
-                    fouls_suffered,
-                ]
-
-            df_home = pd.DataFrame.from_dict(results_home, orient="index", columns=cols)
-            # rank teams by points, gd, goals_scored
-            df_home["rank_points"] = (
-                df_home["points"] * 1_000_000
-                + df_home["gd"] * 1000
-                + df_home["goals_scored"]
-            )
-            df_home["rank"] = (
-                df_home["rank_points"].rank(method="dense", ascending=False).astype(int)
-            )
-            df_home.sort_values(by=["rank"], inplace=True)
-
-        # away table
-        if table_type == "away" or table_type == "overall":
-            for team in teams:
-                team_df = df[df["AwayTeam"] == team]
-                played = len(team_df.index)
-                won = len(team_df[team_df["FTHG"] < team_df["FTAG"]].index)
-                draw = len(team_df[team_df["FTHG"] == team_df["FTAG"]].index)
-                lost = len(team_df[team_df["FTHG"] > team_df["FTAG"]].index)
-                goals_scored = team_df["FTAG"].sum()
-                goals_conceded = team_df["FTHG"].sum()
-                gd = goals_scored - goals_conceded
-                points = won * 3 + draw
-                # additional stats per match
-                goals_scored_pg = team_df["FTAG"].mean()
-                goals_conceded_pg = team_df["FTHG"].mean()
-                corners_for = team_df["AC"].mean()
-                corners_against = team_df["HC"].mean()
-                shots_made = team_df["AS"].mean()
-                shots_allowed = team_df["HS"].mean()
-                shots_to_score_a_goal = shots_made / goals_scored_pg
-                shots_to_concede_a_goal = shots_allowed / goals_conceded_pg
-                yellow_cards = team_df["AY"].mean()
-                red_cards_total = team_df["AR"].sum()
-                fouls_commited = team_df["AF"].mean()
-                fouls_suffered = team_df["HF"].mean()
-                results_away[team] = [
-                    team,
-                    played,
-                    won,
-                    draw,
-                    lost,
-                    goals_scored,
-                    goals_conceded,
-                    gd,
-                    points,
-                    goals_scored_pg,
-                    goals_conceded_pg,
-                    corners_for,
-                    corners_against,
-                    shots_made,
-                    shots_allowed,
-                    shots_to_score_a_goal,
-                    shots_to_concede_a_goal,
-                    yellow_cards,
-                    red_cards_total,
-                    fouls_commited,
-                    fouls_suffered,
-                ]
-
-            df_away = pd.DataFrame.from_dict(results_away, orient="index", columns=cols)
-            # rank teams by points, gd, goals_scored
-            df_away["rank_points"] = (
-                df_away["points"] * 1_000_000
-                + df_away["gd"] * 1000
-                + df_away["goals_scored"]
-            )
-            df_away["rank"] = (
-                df_away["rank_points"].rank(method="dense", ascending=False).astype(int)
-            )
-            df_away.sort_values(by=["rank"], inplace=True)
-
-        # overall table
-        if table_type == "overall":
-            for team in teams:
-
-                played = df_home.loc[team, "played"] + df_away.loc[team, "played"]
-                won = df_home.loc[team, "won"] + df_away.loc[team, "won"]
-                draw = df_home.loc[team, "draw"] + df_away.loc[team, "draw"]
-                lost = df_home.loc[team, "lost"] + df_away.loc[team, "lost"]
-                goals_scored = (
-                    df_home.loc[team, "goals_scored"]
-                    + df_away.loc[team, "goals_scored"]
-                )
-                goals_conceded = (
-                    df_home.loc[team, "goals_conceded"]
-                    + df_away.loc[team, "goals_conceded"]
-                )
-                gd = df_home.loc[team, "gd"] + df_away.loc[team, "gd"]
-                points = won * 3 + draw
-                # additional stats per match
-                goals_scored_pg = (
-                    df_home.loc[team, "goals_scored_pg"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "goals_scored_pg"] * df_away.loc[team, "played"]
-                ) / played
-                goals_conceded_pg = (
-                    df_home.loc[team, "goals_conceded_pg"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "goals_conceded_pg"]
-                    * df_away.loc[team, "played"]
-                ) / played
-                corners_for = (
-                    df_home.loc[team, "corners_for"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "corners_for"] * df_away.loc[team, "played"]
-                ) / played
-                corners_against = (
-                    df_home.loc[team, "corners_against"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "corners_against"] * df_away.loc[team, "played"]
-                ) / played
-                shots_made = (
-                    df_home.loc[team, "shots_made"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "shots_made"] * df_away.loc[team, "played"]
-                ) / played
-                shots_allowed = (
-                    df_home.loc[team, "shots_allowed"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "shots_allowed"] * df_away.loc[team, "played"]
-                ) / played
-                shots_to_score_a_goal = (
-                    df_home.loc[team, "shots_to_score_a_goal"]
-                    * df_home.loc[team, "played"]
-                    + df_away.loc[team, "shots_to_score_a_goal"]
-                    * df_away.loc[team, "played"]
-                ) / played
-                shots_to_concede_a_goal = (
-                    df_home.loc[team, "shots_to_concede_a_goal"]
-                    * df_home.loc[team, "played"]
-                    + df_away.loc[team, "shots_to_concede_a_goal"]
-                    * df_away.loc[team, "played"]
-                ) / played
-                yellow_cards = (
-                    df_home.loc[team, "yellow_cards"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "yellow_cards"] * df_away.loc[team, "played"]
-                ) / played
-                red_cards_total = (
-                    df_home.loc[team, "red_cards_total"]
-                    + df_away.loc[team, "red_cards_total"]
-                )
-                fouls_commited = (
-                    df_home.loc[team, "fouls_commited"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "fouls_commited"] * df_away.loc[team, "played"]
-                ) / played
-                fouls_suffered = (
-                    df_home.loc[team, "fouls_suffered"] * df_home.loc[team, "played"]
-                    + df_away.loc[team, "fouls_suffered"] * df_away.loc[team, "played"]
-                ) / played
-                results_overall[team] = [
-                    team,
-                    played,
-                    won,
-                    draw,
-                    lost,
-                    goals_scored,
-                    goals_conceded,
-                    gd,
-                    points,
-                    goals_scored_pg,
-                    goals_conceded_pg,
-                    corners_for,
-                    corners_against,
-                    shots_made,
-                    shots_allowed,
-                    shots_to_score_a_goal,
-                    shots_to_concede_a_goal,
-                    yellow_cards,
-                    red_cards_total,
-                    fouls_commited,
-                    fouls_suffered,
-                ]
-
-            df_overall = pd.DataFrame.from_dict(
-                results_overall, orient="index", columns=cols
-            )
-            # rank teams by points, gd, goals_scored
-            df_overall["rank_points"] = (
-                df_overall["points"] * 1_000_000
-                + df_overall["gd"] * 1000
-                + df_overall["goals_scored"]
-            )
-            df_overall["rank"] = (
-                df_overall["rank_points"]
-                .rank(method="dense", ascending=False)
-                .astype(int)
-            )
-            df_overall.sort_values(by=["rank"], inplace=True)
-
-        if table_type == "overall":
-            return df_overall
-        elif table_type == "home":
-            return df_home
-        elif table_type == "away":
-            return df_away
-        else:
+    @_cached_result
+    def _calc_all_tables(self) -> dict:
+        return _calc_tables(self.data, by=["season"])
+
+    @_cached_result
+    def summary_ft_results(self) -> "pd.DataFrame":
+        """get the full time results and their odds, indexed by (season, result)"""
+        return _calc_ft_results(self.data)
+
+    @_cached_result
+    def summary_odds(self, bookmakers: list = None) -> "pd.DataFrame":
+        """get the 1X2 odds of every bookmaker, indexed by
+        (season, bookmaker, result)"""
+        return _calc_odds_summary(self.data, bookmakers)
+
+    @_cached_result
+    def summary_goal_spread(self, max_goals: int = 3) -> "pd.DataFrame":
+        """get the spread of goals, indexed by (season, score)"""
+        seasons, hists = self.scoreline_histograms
+        return _calc_goal_spread(hists, max_goals, seasons)
+
+    @_cached_result
+    def summary_goal_markets(self, lines: tuple = GOAL_LINES) -> "pd.DataFrame":
+        """get the goal markets, indexed by (season, market)"""
+        seasons, hists = self.scoreline_histograms
+        return _calc_goal_markets(hists, lines, seasons)
+
+    @_cached_result
+    def fit_score_model(self, season: str, window: int = None) -> PoissonModel:
+        """fit the poisson scoreline model on a season, or on the last `window`
+        matches up to the end of the season"""
+        if window is None:
+            return fit_poisson(self.data[self.data["season"] == season])
+        seasons = self.data["season"].astype(str).map(season_sort_key)
+        df = self.data[seasons <= season_sort_key(season)]
+        df = df[_played(df)].sort_values("Date", kind="stable")
+        return fit_poisson(df.tail(window))
+
+
+# summary name -> SeasonSummary method and arguments, the results that are
+# materialized for every completed season
+MATERIALIZED_SUMMARIES = {
+    "result_matrix": ("get_result_matrix", ()),
+    "table_overall": ("calc_main_tables", ("overall",)),
+    "table_home": ("calc_main_tables", ("home",)),
+    "table_away": ("calc_main_tables", ("away",)),
+    "matchday_tables": ("calc_matchday_tables", ()),
+    "team_stats": ("calc_all_team_stats", ()),
+    "ft_results": ("summary_ft_results", ()),
+    "odds": ("summary_odds", ()),
+    "goal_spread": ("summary_goal_spread", ()),
+    "goal_markets": ("summary_goal_markets", ()),
+    "stats": ("summary_stats", ()),
+}
+
+
+def is_complete_season(df: "pd.DataFrame") -> bool:
+    """a season is complete when every team has played every other team twice"""
+    teams = set(df["HomeTeam"].dropna()) | set(df["AwayTeam"].dropna())
+    return bool(teams) and _played(df).sum() == len(teams) * (len(teams) - 1)
+
+
+def summary_dir(season: str, path: str = SUMMARY_PATH) -> str:
+    """get the directory holding the materialized summaries of one season"""
+    return os.path.join(path, f"season={season}")
+
+
+def remove_summaries(season: str, path: str = SUMMARY_PATH) -> None:
+    """remove the materialized summaries of one season, if there are any"""
+    if os.path.isdir(summary_dir(season, path)):
+        shutil.rmtree(summary_dir(season, path))
+
+
+def materialize_summaries(
+    data: "pd.DataFrame",
+    seasons: list = None,
+    path: str = SUMMARY_PATH,
+    store_path: str = STORE_PATH,
+) -> list:
+    """compute the summaries of the completed seasons and write them to path
+
+    `data` holds the seasons (all of them by default) as they were written to
+    the dataset at `store_path`. The season in progress is not materialized,
+    its summaries are computed live. Returns the materialized seasons.
+    """
+    if seasons is None:
+        seasons = data["season"].unique()
+    materialized = []
+    for season in sorted(map(str, seasons), key=season_sort_key):
+        source = file_fingerprint(partition_path(season, store_path))
+        summary = SeasonSummary(data=data, season=season, fingerprint=source)
+        if not is_complete_season(summary.data):
+            remove_summaries(season, path)
+            continue
+        # write next to the target first, so readers never see a partial season
+        target = summary_dir(season, path)
+        tmp = _temp_path(target)
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+        for name, (method, args) in MATERIALIZED_SUMMARIES.items():
+            result = getattr(summary, method)(*args)
+            result.to_parquet(os.path.join(tmp, f"{name}.parquet"))
+        with open(os.path.join(tmp, SUMMARY_META_NAME), "w") as f:
+            json.dump({"season": season, "source": source}, f)
+        remove_summaries(season, path)
+        os.replace(tmp, target)
+        materialized.append(season)
+    return materialized
+
+
+def load_summaries(
+    season: str, path: str = SUMMARY_PATH, store_path: str = STORE_PATH
+) -> "MaterializedSummary":
+    """get the materialized summaries of a season
+
+    returns None when the season was not materialized, because it is in
+    progress, or when its partition changed since they were computed
+    """
+    try:
+        with open(os.path.join(summary_dir(season, path), SUMMARY_META_NAME)) as f:
+            meta = json.load(f)
+        source = file_fingerprint(partition_path(season, store_path))
+    except FileNotFoundError:
+        return None
+    if meta["source"] != source:
+        return None
+    return MaterializedSummary(season, path)
+
+
+class MaterializedSummary:
+    """summaries of a completed season read from the files written by
+    materialize_summaries, with the methods of SeasonSummary the app uses
+
+    results are computed with the default arguments, each one is read from
+    its own small parquet file.
+    """
+
+    def __init__(self, season: str, path: str = SUMMARY_PATH):
+        self.season = season
+        self.path = summary_dir(season, path)
+
+    def __repr__(self):
+        return f"MaterializedSummary(season = {self.season}, path = {self.path})"
+
+    def _read(self, name: str) -> "pd.DataFrame":
+        return pd.read_parquet(os.path.join(self.path, f"{name}.parquet"))
+
+    def get_result_matrix(self) -> "pd.DataFrame":
+        """get the result matrict for the season"""
+        return self._read("result_matrix")
+
+    def summary_ft_results(self) -> "pd.DataFrame":
+        """get the summary of the full time results and their odds"""
+        return self._read("ft_results")
+
+    def summary_odds(self) -> "pd.DataFrame":
+        """get the 1X2 odds of every bookmaker, indexed by (bookmaker, result)"""
+        return self._read("odds")
+
+    def summary_goal_spread(self) -> "pd.DataFrame":
+        """get the spread of goals in a match"""
+        return self._read("goal_spread")
+
+    def summary_goal_markets(self) -> "pd.DataFrame":
+        """get the goal markets"""
+        return self._read("goal_markets")
+
+    def summary_stats(self) -> "pd.DataFrame":
+        """get the stats of corners, shots, cards and fouls"""
+        return self._read("stats")
+
+    def calc_main_tables(self, table_type: str = "overall") -> "pd.DataFrame":
+        """get the ranking table"""
+        if table_type not in ("overall", "home", "away"):
             return 0
 
-    def calc_team_stats(self, team: str) -> "pd.DataFrame":
-        overall_main_tables = self.calc_main_tables("overall")
-        home_main_tables = self.calc_main_tables("home")
-        away_main_tables = self.calc_main_tables("away")
-        dfs = {
-            "Total": overall_main_tables,
-            "Home": home_main_tables,
-            "Away": away_main_tables,
-        }
-        cols = [
-            "category",
-            "mp",
-            "win",
-            "draw",
-            "lost",
-            "gs",
-            "gc",
-            "total_goals",
-            "position",
-            "points",
-            "avg_points",
-            "avg_gs",
-            "avg_gc",
-            "avg_goals",
-            "corners_for",
-            "corners_against",
-            "corners_total",
-            "shots_on_goal_f",
-            "shots_on_goal_a",
-            "fouls_commited",
-            "fouls_suffered",
-            "fouls_total",
-        ]
-        record = {}
-        for row in ["Total", "Home", "Away"]:
-            df = dfs[row]
-            category = row
-            mp = df.loc[team, "played"]
-            win = df.loc[team, "won"]
-            draw = df.loc[team, "draw"]
-            lost = df.loc[team, "lost"]
-            gs = df.loc[team, "goals_scored"]
-            gc = df.loc[team, "goals_conceded"]
-            total_goals = gs + gc
-            position = df.loc[team, "rank"]
-            points = df.loc[team, "points"]
-            avg_points = points / mp
-            avg_gs = df.loc[team, "goals_scored_pg"]
-            avg_gc = df.loc[team, "goals_conceded_pg"]
-            avg_goals = avg_gs + avg_gc
-            corners_for = df.loc[team, "corners_for"]
-            corners_against = df.loc[team, "corners_against"]
-            corners_total = corners_for + corners_against
-            shots_on_goal_f = df.loc[team, "shots_to_score_a_goal"]
-            shots_on_goal_a = df.loc[team, "shots_to_concede_a_goal"]
-            fouls_commited = df.loc[team, "fouls_commited"]
-            fouls_suffered = df.loc[team, "fouls_suffered"]
-            fouls_total = fouls_commited + fouls_suffered
-
-            record[row] = [
-                category,
-                mp,
-                win,
-                draw,
-                lost,
-                gs,
-                gc,
-                total_goals,
-                position,
-                points,
-                avg_points,
-                avg_gs,
-                avg_gc,
-                avg_goals,
-                corners_for,
-                corners_against,
-                corners_total,
-                shots_on_goal_f,
-                shots_on_goal_a,
-                fouls_commited,
-                fouls_suffered,
-                fouls_total,
-            ]
+        return self._read(f"table_{table_type}")
+
+    def calc_matchday_tables(self) -> "pd.DataFrame":
+        """get the overall table after every matchday, indexed by (matchday, team)"""
+        return self._read("matchday_tables")
 
-        results = pd.DataFrame.from_dict(record, orient="index", columns=cols)
+    def calc_matchday_table(self, matchday: int) -> "pd.DataFrame":
+        """get the overall table after a matchday"""
+        return self.calc_matchday_tables().loc[matchday]
 
+    def calc_team_stats(self, team: str) -> "pd.DataFrame":
+        """get the total, home and away stats of a single team"""
+        results = self.calc_all_team_stats().loc[team]
+        results.index.name = None
         return results
 
+    def calc_all_team_stats(self) -> "pd.DataFrame":
+        """get the total, home and away stats of all teams, indexed by team"""
+        return self._read("team_stats")
+
+
+def print_progress(event) -> None:
+    """print the progress events of read_csv_data"""
+    if isinstance(event, SchemaReport):
+        print(event)
+    else:
+        print(
+            f"processed season: {event.season} ({event.done}/{event.total}), "
+            f"{event.rows} rows in {event.seconds:.2f}s"
+        )
+
 
 def main():
-    all_df = read_csv_data()
+    all_df = read_csv_data(progress=print_progress)
     # all_df = pd.read_csv("data/bet_data.csv", low_memory=False)
     # seasons = all_df.season.unique()
     # for season in seasons:
@@ -0,0 +1,122 @@
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import talib
+from talib import abstract
+from sqlalchemy import create_engine, delete
+from stock_data import DATABASE, StockMomentums
+
+# talib candle pattern functions, code -> name
+CANDLE_PATTERNS = {
+    code: abstract.Function(code).info["display_name"]
+    for code in talib.get_function_groups()["Pattern Recognition"]
+}
+_OHLC = ["open", "high", "low", "close"]
+
+
+def group_prices(prices: "pd.DataFrame") -> tuple:
+    """sort the prices by stock and date once
+
+    returns the ohlc arrays, the price ids and the row where every stock
+    starts, with the end of the last one appended.
+    """
+    prices = prices.sort_values(["stock_id", "date"], kind="stable")
+    stock_ids = prices["stock_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, stock_ids[1:] != stock_ids[:-1]])
+    ohlc = prices[_OHLC].to_numpy(dtype=float)
+    return ohlc, prices["price_id"].to_numpy(), np.append(starts, len(stock_ids))
+
+
+def _recognize_chunk(ohlc: "np.ndarray", bounds: "np.ndarray", codes: list) -> tuple:
+    """run every pattern over every stock of a chunk of sorted prices
+
+    returns the pattern positions, rows and values of the hits.
+    """
+    values = np.zeros((len(codes), len(ohlc)), dtype=np.int32)
+    columns = [np.ascontiguousarray(col) for col in ohlc.T]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        stock = [col[start:end] for col in columns]
+        for i, code in enumerate(codes):
+            values[i, start:end] = getattr(talib, code)(*stock)
+    patterns, rows = np.nonzero(values)
+    return patterns, rows, values[patterns, rows]
+
+
+def _chunks(bounds: "np.ndarray", chunk_rows: int) -> list:
+    """split the stocks into chunks of about chunk_rows prices, whole stocks"""
+    splits = np.searchsorted(bounds, np.arange(0, bounds[-1], chunk_rows))
+    splits = np.unique(np.append(splits, len(bounds) - 1))
+    return [bounds[first : last + 1] for first, last in zip(splits[:-1], splits[1:])]
+
+
+def recognize_patterns(
+    prices: "pd.DataFrame",
+    pattern_ids: dict = None,
+    processes: int = None,
+    chunk_rows: int = 200_000,
+) -> "pd.DataFrame":
+    """find the candle patterns of every stock, the stock_momentums table
+
+    prices are grouped by stock once and the stocks are split in chunks of
+    about `chunk_rows` prices, run in a pool of `processes` (all cores by
+    default, 1 runs them in this process). `pattern_ids` maps the talib
+    codes to run to their pattern_id, all patterns in order by default.
+    """
+    if pattern_ids is None:
+        pattern_ids = {code: i for i, code in enumerate(CANDLE_PATTERNS)}
+    codes = list(pattern_ids)
+    ohlc, price_ids, bounds = group_prices(prices)
+    chunks = _chunks(bounds, chunk_rows)
+    # every chunk gets its own rows, counted from its first one
+    tasks = [(ohlc[b[0] : b[-1]], b - b[0]) for b in chunks]
+    if processes == 1 or len(tasks) <= 1:
+        results = [_recognize_chunk(*task, codes) for task in tasks]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(
+                pool.map(
+                    _recognize_chunk,
+                    *zip(*tasks),
+                    [codes] * len(tasks),
+                )
+            )
+
+    counts = [len(rows) for _, rows, _ in results]
+    hits = sum(counts)
+    momentums = {
+        "pattern_id": np.empty(hits, dtype=np.int64),
+        "price_id": np.empty(hits, dtype=price_ids.dtype),
+        "value": np.empty(hits, dtype=float),
+    }
+    code_ids = np.array([pattern_ids[code] for code in codes], dtype=np.int64)
+    offset = 0
+    for chunk, (patterns, rows, values), count in zip(chunks, results, counts):
+        hit = slice(offset, offset + count)
+        momentums["pattern_id"][hit] = code_ids[patterns]
+        momentums["price_id"][hit] = price_ids[rows + chunk[0]]
+        momentums["value"][hit] = values
+        offset += count
+    momentums = pd.DataFrame(momentums)
+    momentums["momentum_id"] = momentums.index
+    return momentums
+
+
+def main():
+    engine = create_engine(
+        sys.argv[1] if len(sys.argv) > 1 else DATABASE, echo=False, future=False
+    )
+    prices = pd.read_sql_table(
+        "stock_prices", engine, columns=["stock_id", "date", "price_id"] + _OHLC
+    )
+    patterns = pd.read_sql_table("candle_patterns", engine)
+    pattern_ids = dict(zip(patterns["pattern_code"], patterns["pattern_id"]))
+    momentums = recognize_patterns(prices, pattern_ids)
+    print(f"found {len(momentums.index)} patterns in {len(prices.index)} prices")
+    with engine.begin() as conn:
+        conn.execute(delete(StockMomentums))
+        momentums.to_sql("stock_momentums", conn, if_exists="append", index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 import streamlit as st
-from data_proc import SeasonSummary
-import pandas as pd
-
+from data_proc import (
+    MultiSeasonSummary,
+    SeasonSummary,
+    TeamIndex,
+    columns_for,
+    ensure_dataset,
+    list_seasons,
+    load_dataset,
+    load_summaries,
+    partition_path,
+)
+from ratings import update_ratings
+from result_cache import file_fingerprint
 
 st.set_page_config(
     page_title="Streamlit Premier League App",
@@ -10,9 +20,39 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+
+@st.cache(allow_output_mutation=True)
+def load_data(season, columns, fingerprint):
+    # loaded once per process and shared by all sessions, do not modify.
+    # the fingerprint argument reloads the season when its partition changes
+    return load_dataset(seasons=season, columns=list(columns))
+
+
+@st.cache(allow_output_mutation=True)
+def load_team_index(fingerprints):
+    # match results of all seasons, shared by all sessions, do not modify
+    return TeamIndex(load_dataset(columns=columns_for("match", "goals")))
+
+
+@st.cache(allow_output_mutation=True)
+def load_ratings(fingerprints):
+    # elo ratings before every match, shared by all sessions, do not modify.
+    # only the matches added since the saved ratings are rated
+    return update_ratings(load_dataset(columns=columns_for("match", "goals")))
+
+
+@st.cache(allow_output_mutation=True)
+def load_score_model(season, window, fingerprints):
+    # fitted once per (season, window), shared by all sessions, do not modify
+    data = load_dataset(columns=columns_for("match", "goals"))
+    summary = MultiSeasonSummary(data, fingerprint="-".join(fingerprints))
+    return summary.fit_score_model(season, window)
+
+
 st.write("## Welcome to the Premier League App!")
-# load data from csv file
-all_df = pd.read_csv("bet_data.csv", low_memory=False)
+# the dataset is partitioned by season, each page only reads the columns
+# of the selected season
+ensure_dataset()
 # use the dropdown to navigate different pages.
 
 main_menu = [
@@ -23,7 +63,7 @@ main_menu = [
     # "Goals & Scores",
     # "News",
 ]
-season_menu = all_df["season"].unique().tolist()
+season_menu = list_seasons()
 home_menu = [
     "Liverpool",
     "Arsenal",
@@ -52,11 +92,19 @@ season = st.sidebar.selectbox(
     "Select your season:", season_menu, index=len(season_menu) - 1
 )
 
-# choose the current season's data
-data_summary = SeasonSummary(data=all_df, season=season)
-result_matrix = data_summary.get_result_matrix()
-result_matrix.index = result_matrix["Teams"]
-result_matrix.drop(columns=["Teams"], inplace=True)
+# completed seasons are read from the summaries materialized at ingestion,
+# the season in progress is computed from the current season's data
+data_summary = load_summaries(season)
+if data_summary is None:
+    if page == "Results Matrix":
+        page_columns = columns_for("match", "goals")
+    else:
+        page_columns = columns_for("match", "goals", "stats")
+    data_fingerprint = file_fingerprint(partition_path(season))
+    season_df = load_data(season, tuple(page_columns), data_fingerprint)
+    data_summary = SeasonSummary(
+        data=season_df, season=season, fingerprint=data_fingerprint
+    )
 
 # Display data
 if page == "League Tables":
@@ -71,14 +119,33 @@ if page == "League Tables":
         "gd",
         "points",
     ]
-    league_table = data_summary.calc_main_tables(table_type)
+    if table_type == "overall":
+        # the tables of every matchday are computed at once, moving the
+        # slider only selects one of them
+        matchday_tables = data_summary.calc_matchday_tables()
+        last_matchday = int(matchday_tables.index.get_level_values("matchday").max())
+        matchday = st.sidebar.slider("Matchday:", 1, last_matchday, last_matchday)
+        league_table = data_summary.calc_matchday_table(matchday)
+        display_cols.append("form")
+    else:
+        league_table = data_summary.calc_main_tables(table_type)
     league_table = league_table[display_cols]
     st.dataframe(data=league_table, height=900)
 if page == "Results Matrix":
+    result_matrix = data_summary.get_result_matrix()
+    result_matrix.index = result_matrix["Teams"]
+    result_matrix.drop(columns=["Teams"], inplace=True)
     st.dataframe(data=result_matrix, height=900)
 if page == "Head-to-Head":
     home_team = st.sidebar.selectbox("Select home team:", home_menu, index=0)
     away_team = st.sidebar.selectbox("Select away team:", away_menu, index=1)
+    model_window = st.sidebar.selectbox(
+        "Model fitted on:",
+        [None, 190, 380, 760],
+        format_func=lambda window: (
+            "the season" if window is None else f"the last {window} matches"
+        ),
+    )
     col1, col2 = st.beta_columns(2)
     stats_displays = [
         ["mp", "win", "draw", "lost", "gs", "gc"],
@@ -88,16 +155,56 @@ if page == "Head-to-Head":
         ["shots_on_goal_f", "shots_on_goal_a"],
         ["fouls_commited", "fouls_suffered", "fouls_total"],
     ]
+    all_stats = data_summary.calc_all_team_stats()
+    season_fingerprints = tuple(
+        file_fingerprint(partition_path(s)) for s in season_menu
+    )
+    ratings = load_ratings(season_fingerprints)
+    # strength at the end of the selected season, not the latest one
+    season_end = ratings.season_end(season)
     with col1:
         st.header(home_team)
-        stats = data_summary.calc_team_stats(home_team)
+        st.write(f"Elo rating: {ratings.rating_at(home_team, season_end):.0f}")
+        stats = all_stats.loc[home_team]
 
         for stats_display in stats_displays:
             st.dataframe(stats[stats_display], width=450)
 
     with col2:
         st.header(away_team)
-        stats = data_summary.calc_team_stats(away_team)
+        st.write(f"Elo rating: {ratings.rating_at(away_team, season_end):.0f}")
+        stats = all_stats.loc[away_team]
 
         for stats_display in stats_displays:
             st.dataframe(stats[stats_display], width=450)
+
+    st.write("### Model Prices")
+    score_model = load_score_model(season, model_window, season_fingerprints)
+    try:
+        st.dataframe(score_model.prices(home_team, away_team), width=450)
+    except KeyError as e:
+        st.write(f"No model prices: {e.args[0]}")
+
+    st.write("### Head-to-Head Results")
+    team_index = load_team_index(season_fingerprints)
+    meetings = team_index.head_to_head(home_team, away_team)
+    # strength of both teams going into each meeting
+    meetings = meetings.join(
+        ratings.match_ratings(meetings)[["home_elo", "away_elo"]].round()
+    )
+    st.dataframe(
+        meetings[
+            [
+                "season",
+                "Date",
+                "HomeTeam",
+                "AwayTeam",
+                "FTHG",
+                "FTAG",
+                "FTR",
+                "home_elo",
+                "away_elo",
+            ]
+        ],
+        width=900,
+    )
@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+RATINGS_PATH = "bet_ratings.parquet"
+# rated matches, with the ratings of both teams before each of them
+MATCHES_NAME = "matches.parquet"
+# current ratings and the parameters they were computed with
+STATE_NAME = "_state.json"
+
+_MATCH_COLS = ["season", "Date", "HomeTeam", "AwayTeam", "FTHG", "FTAG"]
+_KEY_COLS = ["Date", "HomeTeam", "AwayTeam"]
+_RATING_COLS = ["home_elo", "away_elo", "home_expected", "elo_change"]
+
+
+def _match_frame(data: "pd.DataFrame") -> "pd.DataFrame":
+    """get the played matches of data in date order"""
+    played = data["FTHG"].notna() & data["FTAG"].notna()
+    matches = data.loc[played, _MATCH_COLS].astype(
+        {"season": str, "HomeTeam": str, "AwayTeam": str, "FTHG": int, "FTAG": int}
+    )
+    return matches.sort_values("Date", kind="stable", ignore_index=True)
+
+
+def _temp_path(path: str) -> str:
+    """get a temporary name next to path, unique to this process and thread"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _goal_multiplier(goal_diff: int) -> float:
+    """weight of a result by its goal difference, as in the world football elo"""
+    if goal_diff <= 1:
+        return 1.0
+    if goal_diff == 2:
+        return 1.5
+    return (11 + goal_diff) / 8
+
+
+class EloRatings:
+    """elo ratings of every team, updated match by match in date order
+
+    the ratings of both teams before every match are kept in `matches`, so
+    that the strength of a team at any date is a lookup. New matches are
+    rated on top of the current ratings, history is only rated again when
+    a result changed or a match older than the last rated one is added.
+    """
+
+    def __init__(
+        self,
+        k: float = 20.0,
+        home_advantage: float = 60.0,
+        initial: float = 1500.0,
+        season_regression: float = 0.2,
+    ):
+        self.k = k
+        self.home_advantage = home_advantage
+        self.initial = initial
+        # share of the distance to the initial rating lost between seasons
+        self.season_regression = season_regression
+        self.ratings = {}
+        self._seasons = {}
+        self.matches = pd.DataFrame(columns=_MATCH_COLS + _RATING_COLS)
+        self._keys = None
+        self._history = None
+
+    def __repr__(self):
+        return f"EloRatings(teams = {len(self.ratings)}, matches = {len(self.matches)})"
+
+    def __len__(self):
+        return len(self.matches.index)
+
+    @property
+    def params(self) -> dict:
+        return {
+            "k": self.k,
+            "home_advantage": self.home_advantage,
+            "initial": self.initial,
+            "season_regression": self.season_regression,
+        }
+
+    @property
+    def last_date(self):
+        return self.matches["Date"].iloc[-1] if len(self) else None
+
+    def _rating_before(self, team: str, season: str) -> float:
+        rating = self.ratings.get(team, self.initial)
+        if team in self._seasons and self._seasons[team] != season:
+            rating -= (rating - self.initial) * self.season_regression
+        self._seasons[team] = season
+        return rating
+
+    def _rate(self, matches: "pd.DataFrame") -> "pd.DataFrame":
+        """rate matches in order on top of the current ratings"""
+        ratings = np.empty((len(matches.index), len(_RATING_COLS)))
+        rows = zip(
+            matches["season"],
+            matches["HomeTeam"],
+            matches["AwayTeam"],
+            matches["FTHG"],
+            matches["FTAG"],
+        )
+        for i, (season, home, away, home_goals, away_goals) in enumerate(rows):
+            home_elo = self._rating_before(home, season)
+            away_elo = self._rating_before(away, season)
+            expected = 1 / (
+                1 + 10 ** ((away_elo - home_elo - self.home_advantage) / 400)
+            )
+            score = (np.sign(home_goals - away_goals) + 1) / 2
+            change = (
+                self.k
+                * _goal_multiplier(abs(home_goals - away_goals))
+                * (score - expected)
+            )
+            self.ratings[home] = home_elo + change
+            self.ratings[away] = away_elo - change
+            ratings[i] = home_elo, away_elo, expected, change
+        return matches.assign(**dict(zip(_RATING_COLS, ratings.T)))
+
+    def reset(self) -> None:
+        self.ratings = {}
+        self._seasons = {}
+        self.matches = self.matches.iloc[0:0]
+        self._keys = None
+        self._history = None
+
+    def update(self, data: "pd.DataFrame") -> int:
+        """rate the matches of data that are not rated yet
+
+        returns the number of rated matches. Matches already rated with the
+        same score are skipped, so the whole dataset or just the new season
+        files can be passed in.
+        """
+        new = _match_frame(data)
+        keys = self.match_index()
+        known = pd.MultiIndex.from_frame(new[_KEY_COLS]).isin(keys)
+        stored = self.matches.set_index(_KEY_COLS).reindex(
+            pd.MultiIndex.from_frame(new.loc[known, _KEY_COLS])
+        )
+        changed = np.zeros(len(new.index), dtype=bool)
+        changed[known] = (
+            stored["FTHG"].to_numpy() != new.loc[known, "FTHG"].to_numpy()
+        ) | (stored["FTAG"].to_numpy() != new.loc[known, "FTAG"].to_numpy())
+        fresh = new[~known]
+        if fresh.empty and not changed.any():
+            return 0
+
+        if not changed.any() and (
+            self.last_date is None or fresh["Date"].min() >= self.last_date
+        ):
+            rated = self._rate(fresh)
+            matches = [self.matches, rated] if len(self) else [rated]
+            count = len(rated.index)
+        else:
+            # a result was corrected or an older match added, rate them all again
+            everything = self.matches[_MATCH_COLS].copy()
+            rows = keys.get_indexer(
+                pd.MultiIndex.from_frame(new.loc[changed, _KEY_COLS])
+            )
+            for col in ["FTHG", "FTAG"]:
+                everything.iloc[rows, everything.columns.get_loc(col)] = new.loc[
+                    changed, col
+                ].to_numpy()
+            everything = pd.concat([everything, fresh], ignore_index=True)
+            self.reset()
+            rated = self._rate(
+                everything.sort_values("Date", kind="stable", ignore_index=True)
+            )
+            matches = [rated]
+            count = len(rated.index)
+        self.matches = pd.concat(matches, ignore_index=True)
+        self._keys = None
+        self._history = None
+        return count
+
+    def match_index(self) -> "pd.MultiIndex":
+        """index of the rated matches by (Date, HomeTeam, AwayTeam)"""
+        if self._keys is None:
+            self._keys = pd.MultiIndex.from_frame(self.matches[_KEY_COLS])
+        return self._keys
+
+    def match_ratings(self, matches: "pd.DataFrame") -> "pd.DataFrame":
+        """get the ratings of both teams before each of the given matches"""
+        keys = pd.MultiIndex.from_frame(
+            matches[_KEY_COLS].astype({"HomeTeam": str, "AwayTeam": str})
+        )
+        ratings = self.matches[_RATING_COLS].set_axis(self.match_index())
+        return ratings.reindex(keys).set_axis(matches.index)
+
+    def _team_history(self) -> dict:
+        """dates of the matches of every team and its rating after them"""
+        if self._history is None:
+            after = pd.DataFrame(
+                {
+                    "team": np.concatenate(
+                        [self.matches["HomeTeam"], self.matches["AwayTeam"]]
+                    ),
+                    "Date": np.concatenate([self.matches["Date"]] * 2),
+                    "rating": np.concatenate(
+                        [
+                            self.matches["home_elo"] + self.matches["elo_change"],
+                            self.matches["away_elo"] - self.matches["elo_change"],
+                        ]
+                    ),
+                }
+            ).sort_values("Date", kind="stable")
+            self._history = {
+                team: (rows["Date"].to_numpy(), rows["rating"].to_numpy())
+                for team, rows in after.groupby("team")
+            }
+        return self._history
+
+    def rating_at(self, team: str, date=None) -> float:
+        """get the rating of a team before a date, its current one by default"""
+        if date is None:
+            return self.ratings.get(team, self.initial)
+        dates, ratings = self._team_history().get(team, ((), ()))
+        i = np.searchsorted(dates, np.datetime64(pd.Timestamp(date)), side="left")
+        return ratings[i - 1] if i else self.initial
+
+    def season_end(self, season: str):
+        """get the day after the last rated match of a season, to read the
+        ratings at the end of it with rating_at, None when it has none"""
+        dates = self.matches.loc[self.matches["season"] == season, "Date"]
+        return dates.max() + pd.Timedelta(days=1) if len(dates.index) else None
+
+    def table(self) -> "pd.Series":
+        """current ratings of every team, the strongest first"""
+        return pd.Series(self.ratings, name="elo").sort_values(ascending=False)
+
+    def save(self, path: str = RATINGS_PATH) -> None:
+        """write the rated matches and the current ratings to path"""
+        os.makedirs(path, exist_ok=True)
+        # sessions can save at the same time, each writes its own temp files
+        file = os.path.join(path, MATCHES_NAME)
+        tmp = _temp_path(file)
+        self.matches.to_parquet(tmp, index=False)
+        os.replace(tmp, file)
+        state = {
+            "params": self.params,
+            "matches": len(self),
+            "ratings": self.ratings,
+            "seasons": self._seasons,
+        }
+        file = os.path.join(path, STATE_NAME)
+        tmp = _temp_path(file)
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, file)
+
+    @classmethod
+    def load(cls, path: str = RATINGS_PATH, **params) -> "EloRatings":
+        """read the ratings saved at path, empty ratings when there are none
+        or they were computed with other parameters"""
+        ratings = cls(**params)
+        try:
+            with open(os.path.join(path, STATE_NAME)) as f:
+                state = json.load(f)
+            matches = pd.read_parquet(os.path.join(path, MATCHES_NAME))
+        except FileNotFoundError:
+            return ratings
+        if state["params"] != ratings.params:
+            return ratings
+        if state["matches"] != len(matches.index):
+            # saving was interrupted, the matches hold all the history
+            ratings.update(matches)
+            return ratings
+        ratings.matches = matches
+        ratings.ratings = state["ratings"]
+        ratings._seasons = state["seasons"]
+        return ratings
+
+
+def update_ratings(data: "pd.DataFrame", path: str = RATINGS_PATH) -> EloRatings:
+    """rate the new matches of data on top of the saved ratings and save them"""
+    ratings = EloRatings.load(path)
+    if ratings.update(data) or not os.path.exists(os.path.join(path, STATE_NAME)):
+        ratings.save(path)
+    return ratings
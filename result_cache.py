@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import pandas as pd
+
+
+def dataset_fingerprint(data: "pd.DataFrame") -> str:
+    """get a content hash of a dataframe, used as part of the cache keys"""
+    digest = hashlib.sha1()
+    digest.update(",".join(map(str, data.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """get a cheap fingerprint of a data file from its size and mtime"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """estimate the memory held by a cached value in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """thread safe LRU cache of computed results with a memory cap
+
+    Streamlit runs every session in a thread of the same process, so one
+    instance is shared by all sessions. A result that is being computed is
+    only computed once, concurrent callers wait for it instead.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 256 * 1024**2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"ResultCache(entries = {len(self)}, nbytes = {self.nbytes}, "
+            f"hits = {self.hits}, misses = {self.misses})"
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def get_or_compute(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """get the result for key, calling func to compute it on a miss"""
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # another session is computing the same result
+            event.wait()
+
+        try:
+            value = func()
+            self.put(key, value)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """store a result and evict the least recently used ones over the caps"""
+        nbytes = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+RESULT_CACHE = ResultCache()
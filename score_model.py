@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# goal lines of the under/over prices
+GOAL_LINES = (0.5, 1.5, 2.5, 3.5, 4.5)
+# scores above this are left out of the scoreline matrices
+MAX_GOALS = 10
+
+
+def _poisson_pmf(rates: "np.ndarray", max_goals: int = MAX_GOALS) -> "np.ndarray":
+    """get P(goals = 0..max_goals) of every rate, one row per rate"""
+    rates = np.asarray(rates, dtype=float)[..., None]
+    goals = np.arange(max_goals + 1)
+    # lambda^k / k! as a running product, no factorials needed
+    terms = np.concatenate(
+        [np.ones(rates.shape), np.cumprod(rates / goals[1:], axis=-1)], axis=-1
+    )
+    return np.exp(-rates) * terms
+
+
+class PoissonModel:
+    """independent poisson model of the goals of a match
+
+    the home team scores at a rate of home * attack[home] * defence[away] and
+    the away team at attack[away] * defence[home], where a defence above 1
+    concedes more than average. The model is shared by all callers through
+    the result cache, do not modify it.
+    """
+
+    def __init__(
+        self,
+        teams: list,
+        attack: "np.ndarray",
+        defence: "np.ndarray",
+        home: float,
+        matches: int,
+        log_likelihood: float,
+    ):
+        self.teams = pd.Index(teams)
+        self.attack = attack
+        self.defence = defence
+        self.home = home
+        self.matches = matches
+        self.log_likelihood = log_likelihood
+
+    def __repr__(self):
+        return (
+            f"PoissonModel(teams = {len(self.teams)}, matches = {self.matches}, "
+            f"home = {self.home:.3f})"
+        )
+
+    def params(self) -> "pd.DataFrame":
+        """get the attack and defence of every team, the strongest attack first"""
+        params = pd.DataFrame(
+            {"attack": self.attack, "defence": self.defence}, index=self.teams
+        )
+        return params.sort_values("attack", ascending=False)
+
+    def _team(self, team: str) -> int:
+        position = self.teams.get_indexer([team])[0]
+        if position < 0:
+            raise KeyError(f"{team} has no matches in the model")
+        return position
+
+    def expected_goals(self, home_team: str, away_team: str) -> tuple:
+        """get the expected goals of the home and the away team"""
+        home, away = self._team(home_team), self._team(away_team)
+        return (
+            self.home * self.attack[home] * self.defence[away],
+            self.attack[away] * self.defence[home],
+        )
+
+    def score_matrix(
+        self, home_team: str, away_team: str, max_goals: int = MAX_GOALS
+    ) -> "pd.DataFrame":
+        """get the probability of every score, home goals by away goals"""
+        home_rate, away_rate = self.expected_goals(home_team, away_team)
+        probs = np.outer(
+            _poisson_pmf(home_rate, max_goals), _poisson_pmf(away_rate, max_goals)
+        )
+        return pd.DataFrame(probs).rename_axis(index=home_team, columns=away_team)
+
+    def prices(
+        self, home_team: str, away_team: str, lines: tuple = GOAL_LINES
+    ) -> "pd.DataFrame":
+        """get the probability and fair odds of the 1X2, under/over and both
+        teams to score markets of a fixture"""
+        probs = self.score_matrix(home_team, away_team).to_numpy()
+        home_goals, away_goals = np.indices(probs.shape)
+        total = home_goals + away_goals
+        markets = {
+            "home_win": probs[home_goals > away_goals].sum(),
+            "draw": probs[home_goals == away_goals].sum(),
+            "away_win": probs[home_goals < away_goals].sum(),
+        }
+        for line in lines:
+            markets[f"over_{line}"] = probs[total > line].sum()
+            markets[f"under_{line}"] = probs[total < line].sum()
+        markets["btts_yes"] = probs[(home_goals > 0) & (away_goals > 0)].sum()
+        markets["btts_no"] = probs[(home_goals == 0) | (away_goals == 0)].sum()
+        prices = pd.DataFrame({"prob": pd.Series(markets)})
+        prices["fair_odds"] = 1 / prices["prob"]
+        return prices
+
+
+def fit_poisson(
+    data: "pd.DataFrame", tol: float = 1e-8, max_iter: int = 500
+) -> PoissonModel:
+    """fit the attack and defence of every team by maximum likelihood
+
+    the likelihood equations of the model are solved by iterative scaling:
+    each step sets the attack of every team to its goals over its expected
+    goals at attack 1, then the same for the defences and the home factor.
+    A step is a few bincounts over all matches at once.
+    """
+    played = data["FTHG"].notna() & data["FTAG"].notna()
+    data = data[played]
+    codes, teams = pd.factorize(
+        pd.concat([data["HomeTeam"], data["AwayTeam"]]).astype(str), sort=True
+    )
+    home, away = np.split(codes, 2)
+    home_goals = data["FTHG"].to_numpy(dtype=float)
+    away_goals = data["FTAG"].to_numpy(dtype=float)
+    num_teams = len(teams)
+
+    def per_team(home_values, away_values):
+        return np.bincount(home, home_values, num_teams) + np.bincount(
+            away, away_values, num_teams
+        )
+
+    scored = per_team(home_goals, away_goals)
+    conceded = per_team(away_goals, home_goals)
+    attack = np.ones(num_teams)
+    defence = np.ones(num_teams)
+    home_factor = 1.0
+    for _ in range(max_iter):
+        previous = np.concatenate([attack, defence, [home_factor]])
+        attack = scored / per_team(home_factor * defence[away], defence[home])
+        defence = conceded / per_team(attack[away], home_factor * attack[home])
+        home_factor = home_goals.sum() / (attack[home] * defence[away]).sum()
+        # attack and defence are only defined up to a common scale
+        scale = attack.mean()
+        attack, defence = attack / scale, defence * scale
+        current = np.concatenate([attack, defence, [home_factor]])
+        if np.abs(current - previous).max() < tol:
+            break
+
+    home_rate = home_factor * attack[home] * defence[away]
+    away_rate = attack[away] * defence[home]
+    # without the log(goals!) terms, which do not depend on the parameters
+    log_likelihood = float(
+        (
+            home_goals * np.log(np.where(home_goals > 0, home_rate, 1))
+            - home_rate
+            + away_goals * np.log(np.where(away_goals > 0, away_rate, 1))
+            - away_rate
+        ).sum()
+    )
+    return PoissonModel(
+        list(teams), attack, defence, float(home_factor), len(home), log_likelihood
+    )
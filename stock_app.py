@@ -1,4 +1,7 @@
+import os
 from mimetypes import init
+from threading import Lock
+from types import MappingProxyType
 from typing import Any
 import streamlit as st
 import pandas as pd
@@ -6,27 +9,128 @@ import plotly.graph_objects as go
 import streamlit.components.v1 as components
 from datetime import date
 from time import time
-from stock_data import StockList, StockPrices, StockMomentums, CandlePatterns
+from stock_data import StockList, StockPrices, CandlePatterns, scan_query
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy import create_engine, event
 
 
 class DataLoader:
     table_names = ["all_stocks", "candle_patterns", "top_patterns"]
     scalar_names = ["today", "earliest_date"]
-    tables = {}
-    scalars = {}
+    # reference tables of every database, loaded once per process and shared
+    # by all sessions: connection -> (database version, tables). They are
+    # reloaded when the database file changes
+    reference_cache = {}
+    reference_lock = Lock()
+    # one engine and session factory per connection string for the whole
+    # process, every streamlit session checks out connections from its pool
+    engines = {}
+    session_factories = {}
+    engines_lock = Lock()
+    pool_size = 5
+    max_overflow = 10
+    # set on every new sqlite connection, in this order: WAL lets readers
+    # run next to a writer, the app itself never writes
+    sqlite_pragmas = {
+        "journal_mode": "WAL",
+        "query_only": "ON",
+        "mmap_size": 256 * 1024**2,
+        "cache_size": -64 * 1024,
+    }
 
     def __init__(self, connection) -> None:
         self.connection = connection
-        for t in self.table_names:
-            self.tables[t] = self.load_table_data(t)
-        for s in self.scalar_names:
-            self.scalars[s] = self.load_scalar_data(s)
+        self.engine = self.get_engine(connection)
+        # shared by all sessions, do not modify the tables
+        self.tables = self.load_reference_tables()
+        self.scalars = MappingProxyType(
+            {s: self.load_scalar_data(s)
+             for s in self.scalar_names})
+
+    @classmethod
+    def get_engine(cls, connection):
+        with cls.engines_lock:
+            if connection not in cls.engines:
+                engine = cls.make_engine(connection)
+                cls.engines[connection] = engine
+                cls.session_factories[connection] = sessionmaker(bind=engine)
+                # the first pooled connection creates the WAL file, so that
+                # it does not change the database version after the first load
+                engine.connect().close()
+            return cls.engines[connection]
+
+    @classmethod
+    def make_engine(cls, connection):
+        if not connection.startswith("sqlite"):
+            return create_engine(
+                connection,
+                echo=False,
+                future=False,
+                pool_size=cls.pool_size,
+                max_overflow=cls.max_overflow,
+                pool_pre_ping=True,
+            )
+
+        engine = create_engine(
+            connection,
+            echo=False,
+            future=False,
+            poolclass=QueuePool,
+            pool_size=cls.pool_size,
+            max_overflow=cls.max_overflow,
+            # pooled connections are used by the threads of many sessions
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", cls.set_sqlite_pragmas)
+        return engine
+
+    @classmethod
+    def set_sqlite_pragmas(cls, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in cls.sqlite_pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
 
     def create_db_session(self):
-        engine = create_engine(self.connection, echo=False, future=False)
-        return sessionmaker(bind=engine)()
+        return self.session_factories[self.connection]()
+
+    def get_db_version(self):
+        """get the mtime and size of the sqlite file and its WAL, which
+        change with every write, None for other databases"""
+        database = self.engine.url.database
+        if self.engine.dialect.name != "sqlite" or not database:
+            return None
+
+        version = ()
+        for path in (database, f"{database}-wal"):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                version += (stat.st_mtime_ns, stat.st_size)
+        return version
+
+    def load_reference_tables(self) -> MappingProxyType:
+        version = self.get_db_version()
+        with self.reference_lock:
+            cached = self.reference_cache.get(self.connection)
+            if cached is None or cached[0] != version:
+                tables = MappingProxyType(
+                    {t: self.load_table_data(t)
+                     for t in self.table_names})
+                cached = self.reference_cache[self.connection] = (version,
+                                                                  tables)
+
+        return cached[1]
+
+    @classmethod
+    def clear_reference_tables(cls, connection=None):
+        """drop the cached reference tables of a database, or of all of them,
+        for changes the database version does not catch"""
+        with cls.reference_lock:
+            if connection is None:
+                cls.reference_cache.clear()
+            else:
+                cls.reference_cache.pop(connection, None)
 
     def load_scalar_data(self, scalar="today") -> Any:
         if scalar == "today":
@@ -174,13 +278,7 @@ class PageMaker:
                         self.data_loader.tables["top_patterns"].index)
 
             with self.data_loader.create_db_session() as session:
-                stocks = (session.query(
-                    StockList, StockMomentums.value,
-                    CandlePatterns).select_from(StockList).join(StockPrices).
-                          join(StockMomentums).join(CandlePatterns).filter(
-                              CandlePatterns.pattern_id.in_(patterns),
-                              StockPrices.date == mark_date,
-                          ).all())
+                stocks = scan_query(session, patterns, mark_date).all()
             return stocks
 
         elif page == "Display":
@@ -228,9 +326,19 @@ class PageMaker:
                 graph_maker = GraphMaker(self.data_loader)
 
                 with st.spinner("loading data..."):
+                    # prices of all the hits in one query
+                    stock_prices = graph_maker.get_graphs_data(
+                        {stock.stock_id
+                         for stock, _, _ in stocks}, start_date, end_date)
+
                     for stock, momentum, pattern in stocks:
                         fig = graph_maker.make_canddle_graph(
-                            stock, start_date, end_date, mark_date)
+                            stock,
+                            start_date,
+                            end_date,
+                            mark_date,
+                            df_stock=stock_prices[stock.stock_id],
+                        )
 
                         trend = "Bullish" if momentum > 0 else "Bearish"
                         (col1 if trend == "Bullish" else col2).write(
@@ -272,19 +380,44 @@ class PageMaker:
 
 
 class GraphMaker:
+    ohlc_columns = [
+        StockPrices.price_id,
+        StockPrices.stock_id,
+        StockPrices.date,
+        StockPrices.open,
+        StockPrices.high,
+        StockPrices.low,
+        StockPrices.close,
+    ]
+
     def __init__(self, data_loader: DataLoader) -> None:
         self.data_loader = data_loader
 
     def get_graph_data(self, stock, start_date, end_date):
+        return self.get_graphs_data([stock.stock_id], start_date,
+                                    end_date)[stock.stock_id]
+
+    def get_graphs_data(self, stock_ids, start_date, end_date) -> dict:
+        """load the OHLC prices of many stocks between two dates in one query
+
+        returns a dict of stock_id -> prices, stocks without prices in the
+        date range get an empty frame.
+        """
         with self.data_loader.create_db_session() as session:
-            df_stock = pd.read_sql_query(
-                stock.prices.statement,
+            df_prices = pd.read_sql_query(
+                session.query(*self.ohlc_columns).filter(
+                    StockPrices.stock_id.in_(list(stock_ids)),
+                    StockPrices.date.between(start_date, end_date),
+                ).order_by(StockPrices.stock_id, StockPrices.date).statement,
                 session.bind,
                 index_col="price_id",
             )
-            df_stock = df_stock[df_stock['date'].between(start_date, end_date)]
 
-        return df_stock
+        grouped = dict(tuple(df_prices.groupby("stock_id", sort=False)))
+        return {
+            stock_id: grouped.get(stock_id, df_prices.iloc[0:0])
+            for stock_id in stock_ids
+        }
 
     def make_canddle_graph(
         self,
@@ -292,9 +425,11 @@ class GraphMaker:
         start_date: date,
         end_date: date,
         mark_date: date,
+        df_stock: pd.DataFrame = None,
     ):
         # for stock, momentum, pattern in data:
-        df_stock = self.get_graph_data(stock, start_date, end_date)
+        if df_stock is None:
+            df_stock = self.get_graph_data(stock, start_date, end_date)
         # trend = "Bullish" if momentum > 0 else "Bearish"
         fig = go.Figure(data=[
             go.Candlestick(
@@ -1,5 +1,8 @@
+import sys
+from datetime import date
 from sqlalchemy import (
     create_engine,
+    inspect,
     Table,
     Column,
     text,
@@ -11,10 +14,11 @@ from sqlalchemy import (
     Float,
     PrimaryKeyConstraint,
     ForeignKey,
+    Index,
 )
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql.sqltypes import Boolean
 from stock_price import StockInfo
 import pandas as pd
@@ -47,6 +51,13 @@ class StockPrices(Base):
     amount = Column(Float)
     turn = Column(Float)
 
+    __table_args__ = (
+        # prices of a stock over a date range, for the graphs
+        Index("ix_stock_prices_stock_id_date", "stock_id", "date"),
+        # prices of all stocks on the scanned date
+        Index("ix_stock_prices_date", "date"),
+    )
+
 
 class CandlePatterns(Base):
     __tablename__ = "candle_patterns"
@@ -64,6 +75,93 @@ class StockMomentums(Base):
     price_id = Column(Integer, ForeignKey("stock_prices.price_id"))
     value = Column(Float)
 
+    __table_args__ = (
+        # patterns found on a price, the join of the scan
+        Index("ix_stock_momentums_price_id_pattern_id", "price_id", "pattern_id"),
+        Index("ix_stock_momentums_pattern_id", "pattern_id"),
+    )
+
+
+def scan_query(session, patterns, mark_date):
+    """query the stocks with one of the patterns on mark_date, with the value
+    and the pattern of every hit"""
+    return (
+        session.query(StockList, StockMomentums.value, CandlePatterns)
+        .select_from(StockList)
+        .join(StockPrices)
+        .join(StockMomentums)
+        .join(CandlePatterns)
+        # filter on the momentums, so that their index is searched
+        .filter(StockMomentums.pattern_id.in_(patterns), StockPrices.date == mark_date)
+    )
+
+
+# ----------------------------- Schema migration ----------------------------- #
+
+DATABASE = "sqlite:///app.db"
+
+
+def migrate(engine) -> list:
+    """add the tables and indexes of the schema missing from a database,
+    returns the names of the created indexes"""
+    Base.metadata.create_all(engine)
+    existing = {
+        index["name"]
+        for table in Base.metadata.sorted_tables
+        for index in inspect(engine).get_indexes(table.name)
+    }
+    created = []
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+                created.append(index.name)
+    if created and engine.dialect.name == "sqlite":
+        # statistics for the query planner to choose between the indexes
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    return created
+
+
+def explain_query(engine, query) -> list:
+    """get the steps of the sqlite query plan of a query"""
+    compiled = query.statement.compile(
+        engine, compile_kwargs={"render_postcompile": True}
+    )
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+        return [row[-1] for row in plan]
+
+
+def check_scan_plan(engine, patterns=(0, 1), mark_date=date(2021, 5, 20)) -> list:
+    """get the steps of the scan query plan that read stock_prices or
+    stock_momentums without an index, empty when both are searched by one"""
+    with Session(engine) as session:
+        plan = explain_query(engine, scan_query(session, patterns, mark_date))
+    tables = (StockPrices.__tablename__, StockMomentums.__tablename__)
+    return [
+        step
+        for step in plan
+        if (step.startswith("SCAN") and any(table in step.split() for table in tables))
+        or "AUTOMATIC" in step
+    ]
+
+
+def main():
+    engine = create_engine(
+        sys.argv[1] if len(sys.argv) > 1 else DATABASE, echo=False, future=False
+    )
+    for name in migrate(engine):
+        print(f"created index {name}")
+    full_scans = check_scan_plan(engine)
+    if full_scans:
+        print("the scan query does not use the indexes:")
+        for step in full_scans:
+            print(f"  {step}")
+        sys.exit(1)
+    print("the scan query uses the indexes")
+
 
 # ------------------------------ Populates data ------------------------------ #
 
@@ -97,32 +195,16 @@ class StockMomentums(Base):
 # df_prices.drop(columns=["code"], inplace=True)
 
 # # Table candle_patterns
+# from pattern_pipeline import CANDLE_PATTERNS, recognize_patterns
 # df_patterns = pd.DataFrame(
-#     candel_patterns.items(), columns=["pattern_code", "pattern_name"]
+#     CANDLE_PATTERNS.items(), columns=["pattern_code", "pattern_name"]
 # )
 # df_patterns["pattern_id"] = df_patterns.index
 
-# # Table stock_momentums
-# df_momentums = pd.DataFrame(columns=["pattern_id", "price_id", "value"])
-# for pattern in candel_patterns.keys():
-#     print(f"recognizing pattern {candel_patterns[pattern]} ....")
-#     pattern_func = getattr(talib, pattern)
-#     for stock_id in df_prices.stock_id.value_counts().index:
-#         data = df_prices[df_prices.stock_id == stock_id].copy()
-#         # print(pattern_func(data.open, data.high, data.low, data.close))
-#         data.loc[:, ["value"]] = pattern_func(
-#             data.open, data.high, data.low, data.close
-#         )
-#         data.loc[:, ["pattern_id"]] = dict(
-#             zip(df_patterns.pattern_code, df_patterns.pattern_id)
-#         )[pattern]
-
-#         data.drop(data[data.value == 0].index, axis=0, inplace=True)
-#         data = data.loc[:, ["pattern_id", "price_id", "value"]]
-
-#         df_momentums = pd.concat([df_momentums, data], ignore_index=True)
-
-# df_momentums["momentum_id"] = df_momentums.index
+# # Table stock_momentums, every pattern of every stock in a process pool
+# df_momentums = recognize_patterns(
+#     df_prices, dict(zip(df_patterns.pattern_code, df_patterns.pattern_id))
+# )
 
 
 # df_stock_list.to_sql("stock_list", engine, if_exists="append", index=False)
@@ -131,3 +213,7 @@ class StockMomentums(Base):
 # df_momentums.to_sql("stock_momentums", engine, if_exists="append", index=False)
 
 # stock_info.logout()
+
+
+if __name__ == "__main__":
+    main()